@@ -1,16 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Response, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from models import models, database
-from passlib.context import CryptContext
 from utils.auth import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from utils.hashing import password_hasher, HashQueueFull
 from utils.limiter import limiter
+from services.task_service import ensure_stage_tasks
 from datetime import timedelta
 import os
 
 router = APIRouter()
-# Switching to pbkdf2_sha256 to avoid the common bcrypt 72-byte limit error in newer environments
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 
 class UserCreate(BaseModel):
     email: str
@@ -28,15 +28,11 @@ class Token(BaseModel):
 # Env check for secure cookies
 is_production = os.getenv("APP_ENV") == "production"
 
-@router.post("/signup")
-@limiter.limit("5/minute")
-def signup(request: Request, user: UserCreate, response: Response, db: Session = Depends(database.get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
-    if db_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    hashed_password = pwd_context.hash(user.password)
-    new_user = models.User(email=user.email, password_hash=hashed_password)
+def get_user_by_email(email: str, db: Session):
+    return db.query(models.User).filter(models.User.email == email).first()
+
+def create_user(email: str, password_hash: str, db: Session) -> int:
+    new_user = models.User(email=email, password_hash=password_hash)
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
@@ -45,10 +41,34 @@ def signup(request: Request, user: UserCreate, response: Response, db: Session =
     new_profile = models.Profile(user_id=new_user.id)
     db.add(new_profile)
     db.commit()
+    # Reads no longer sync tasks, so seed the first stage's tasks now
+    ensure_stage_tasks(new_profile, db)
+    return new_user.id
+
+async def run_hash_job(job):
+    # Password hashing is CPU bound, it runs in the hashing process pool
+    try:
+        return await job
+    except HashQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again",
+            headers={"Retry-After": "1"},
+        )
+
+@router.post("/signup")
+@limiter.limit("5/minute")
+async def signup(request: Request, user: UserCreate, response: Response, db: Session = Depends(database.get_db)):
+    db_user = await run_in_threadpool(get_user_by_email, user.email, db)
+    if db_user:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    
+    hashed_password = await run_hash_job(password_hasher.hash(user.password))
+    new_user_id = await run_in_threadpool(create_user, user.email, hashed_password, db)
     
     # Create token for immediate login
     access_token = create_access_token(
-        data={"sub": str(new_user.id)},
+        data={"sub": str(new_user_id)},
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
     
@@ -63,16 +83,16 @@ def signup(request: Request, user: UserCreate, response: Response, db: Session =
 
     return {
         "message": "User created", 
-        "user_id": new_user.id,
+        "user_id": new_user_id,
         "access_token": access_token,
         "token_type": "bearer"
     }
 
 @router.post("/login", response_model=Token)
 @limiter.limit("5/minute")
-def login(request: Request, user: UserLogin, response: Response, db: Session = Depends(database.get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
-    if not db_user or not pwd_context.verify(user.password, db_user.password_hash):
+async def login(request: Request, user: UserLogin, response: Response, db: Session = Depends(database.get_db)):
+    db_user = await run_in_threadpool(get_user_by_email, user.email, db)
+    if not db_user or not await run_hash_job(password_hasher.verify(user.password, db_user.password_hash)):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
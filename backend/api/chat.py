@@ -1,39 +1,106 @@
-from fastapi import APIRouter, Depends, Request
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from services.ai_service import get_counsellor_response, parse_actions
-from services.task_service import sync_stage_tasks
+from services.ai_service import get_counsellor_response, stream_counsellor_response, parse_actions, strip_actions, build_counsellor_context, ActionStreamFilter
+from services.context_builder import build_prompt_context, render_student_sections
+from services.conversation_summary import refresh_conversation_summary, CHAT_SUMMARY_KEEP_RECENT, CHAT_SUMMARY_BATCH
+from services.snapshot_cache import get_student_snapshot, set_student_snapshot, invalidate_student_snapshot
+from services.task_service import ensure_stage_tasks
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from models import database, models
-from utils.auth import get_current_user
+from utils.auth import get_current_user, Principal
 from utils.limiter import limiter
+from utils.text import normalize_text
 import json
+import os
 
 router = APIRouter()
 
+# Upper bound of unsummarized messages loaded per turn; the token budget trims further
+CHAT_HISTORY_MAX_MESSAGES = CHAT_SUMMARY_KEEP_RECENT + CHAT_SUMMARY_BATCH + 5
+
+CHAT_HISTORY_PAGE_SIZE = int(os.getenv("CHAT_HISTORY_PAGE_SIZE", "50"))
+CHAT_HISTORY_MAX_PAGE_SIZE = int(os.getenv("CHAT_HISTORY_MAX_PAGE_SIZE", "200"))
+
 class ChatRequest(BaseModel):
     message: str
 
-@router.get("/history")
+class ChatHistoryMessage(BaseModel):
+    id: int
+    role: str
+    text: str
+    is_action: bool
+    created_at: Optional[datetime] = None
+
+class ChatHistoryPage(BaseModel):
+    messages: List[ChatHistoryMessage] # Chronological
+    next_cursor: Optional[int] = None # Pass as `before` to get the page of older messages; None on the oldest page
+
+def history_query(table, user_id: int, before: Optional[int], anchor, limit: int):
+    query = select(table.id, table.role, table.text, table.is_action, table.created_at).where(table.user_id == user_id)
+    if before is not None:
+        query = query.where(tuple_(table.created_at, table.id) < tuple_(anchor, before))
+    return query.order_by(table.created_at.desc(), table.id.desc()).limit(limit)
+
+async def load_chat_history_page(user_id: int, before: Optional[int], limit: int, db: AsyncSession) -> dict:
+    """
+    One page of the user's messages, newest first in the query and chronological in the result.
+    Keyset pagination on (created_at, id) over ix_chat_messages_user_id_created_at_id,
+    so every page is an index range scan no matter how far back it is. Past the hot messages
+    the page continues from chat_messages_archive, which holds only a user's oldest messages.
+    """
+    hot, cold = models.ChatMessage, models.ArchivedChatMessage
+    anchor = None
+    if before is not None:
+        # The cursor message's timestamp is read inside the query, so it's compared exactly as stored.
+        # It may be in either table (or have been archived since the last page).
+        # Another user's message id matches nothing and gives an empty page.
+        anchor = func.coalesce(
+            select(hot.created_at).where(hot.id == before, hot.user_id == user_id).scalar_subquery(),
+            select(cold.created_at).where(cold.id == before, cold.user_id == user_id).scalar_subquery(),
+        )
+
+    # One extra row tells whether there is an older page
+    rows = (await db.execute(history_query(hot, user_id, before, anchor, limit + 1))).all()
+    if len(rows) <= limit:
+        rows += (await db.execute(history_query(cold, user_id, before, anchor, limit + 1 - len(rows)))).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "messages": [
+            {"id": row.id, "role": row.role, "text": row.text or "", "is_action": bool(row.is_action), "created_at": row.created_at}
+            for row in reversed(rows)
+        ],
+        "next_cursor": rows[-1].id if has_more else None,
+    }
+
+@router.get("/history", response_model=ChatHistoryPage)
 @limiter.limit("20/minute")
-def get_chat_history(request: Request, current_user: models.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
-    # Limit to last 50 messages to prevent unbounded growth issues in UI
-    messages = db.query(models.ChatMessage).filter(models.ChatMessage.user_id == current_user.id).order_by(models.ChatMessage.created_at.desc()).limit(50).all()
-    # Return in chronological order
-    return sorted(messages, key=lambda x: x.created_at)
+async def get_chat_history(
+    request: Request,
+    before: Optional[int] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(CHAT_HISTORY_PAGE_SIZE, ge=1, le=CHAT_HISTORY_MAX_PAGE_SIZE),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    return await load_chat_history_page(current_user.id, before, limit, db)
 
-@router.post("")
-@limiter.limit("10/minute")
-async def chat_with_counsellor(request: Request, request_body: ChatRequest, current_user: models.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
-    # 1. Fetch user data for deep context with relationships
-    # Optimization: Use joinedload if relationships were configured for eager loading, or just fetch as is but efficiently
-    profile = db.query(models.Profile).filter(models.Profile.user_id == current_user.id).first()
+def load_student_sections(user_id: int, db: Session):
+    # Fetch user data for deep context with relationships
+    profile = db.query(models.Profile).filter(models.Profile.user_id == user_id).first()
     
     # Validation: Ensure profile exists
     if not profile:
         # Auto-create if missing (unlikely but safe)
-        profile = models.Profile(user_id=current_user.id)
+        profile = models.Profile(user_id=user_id)
         db.add(profile)
         db.commit()
+        ensure_stage_tasks(profile, db)
     
     # Fetch shortlist and include university data
     # Optimization: Joining University table to avoid N+1
@@ -41,7 +108,7 @@ async def chat_with_counsellor(request: Request, request_body: ChatRequest, curr
     shortlist_data = (
         db.query(models.Shortlist, models.University)
         .join(models.University, models.Shortlist.university_id == models.University.id)
-        .filter(models.Shortlist.user_id == current_user.id)
+        .filter(models.Shortlist.user_id == user_id)
         .all()
     )
     
@@ -52,8 +119,27 @@ async def chat_with_counsellor(request: Request, request_body: ChatRequest, curr
             "is_locked": item.is_locked
         })
 
-    tasks = db.query(models.Task).filter(models.Task.user_id == current_user.id).all()
-    history_mds = db.query(models.ChatMessage).filter(models.ChatMessage.user_id == current_user.id).order_by(models.ChatMessage.created_at.desc()).limit(15).all()
+    tasks = db.query(models.Task).filter(models.Task.user_id == user_id).all()
+    return render_student_sections(profile, shortlist_with_names, tasks)
+
+def build_turn_context(user_id: int, message: str, db: Session):
+    """
+    Loads the student's state, builds the token-budgeted LLM context and stores the user's message.
+    Runs in the threadpool so the blocking queries never touch the event loop.
+    """
+    # 1. Profile, shortlist and tasks come from the snapshot cache; only a miss hits the DB
+    sections = get_student_snapshot(user_id)
+    if sections is None:
+        sections = load_student_sections(user_id, db)
+        set_student_snapshot(user_id, sections)
+
+    # Only messages newer than the rolling summary are sent raw
+    summary = db.query(models.ConversationSummary).filter(models.ConversationSummary.user_id == user_id).first()
+    watermark = summary.last_message_id if summary else 0
+    history_mds = db.query(models.ChatMessage).filter(
+        models.ChatMessage.user_id == user_id,
+        models.ChatMessage.id > watermark
+    ).order_by(models.ChatMessage.id.desc()).limit(CHAT_HISTORY_MAX_MESSAGES).all()
     
     # Format history for LLM (older first)
     history = []
@@ -61,74 +147,73 @@ async def chat_with_counsellor(request: Request, request_body: ChatRequest, curr
         role = "assistant" if m.role == "bot" else "user"
         history.append({"role": role, "text": m.text})
 
-    # 2. Build explicit context string
-    context = ""
-    if profile:
-        context += f"STUDENT PROFILE:\n"
-        context += f"- Name: {profile.full_name}\n"
-        context += f"- Current Education: {profile.current_education_level} in {profile.degree_major}\n"
-        context += f"- Academic Performance: GPA {profile.gpa if profile.gpa else 'Not Provided'}\n"
-        context += f"- Standardized Tests: {json.dumps(profile.exam_scores) if profile.exam_scores else 'None'}\n"
-        context += f"- Target Goal: {profile.target_degree} in {profile.target_field} ({profile.target_intake_year})\n"
-        context += f"- Preference: {', '.join(profile.preferred_countries) if profile.preferred_countries else 'Any'}\n"
-        context += f"- Finance: Budget {profile.budget_range} ({profile.funding_plan})\n"
-        context += f"- Current Milestone: {profile.current_stage}\n"
-    
-    if shortlist_with_names:
-        unis = [f"{s['name']} ({'LOCKED & FINALIZED' if s['is_locked'] else 'Shortlisted'})" for s in shortlist_with_names]
-        context += f"\nDECISION PIPELINE:\n- " + "\n- ".join(unis) + "\n"
-        
-    if tasks:
-        task_list = [f"{t.title} (Status: {t.status})" for t in tasks]
-        context += f"\nACTIVE ADMISSION TASKS:\n- " + "\n- ".join(task_list) + "\n"
+    # 2. Fill the prompt budget in priority order
+    prompt = build_prompt_context(
+        sections,
+        summary.summary if summary else "",
+        history,
+        fixed_text=build_counsellor_context("") + message,
+    )
 
     # 3. Save user message to DB
-    user_msg_db = models.ChatMessage(user_id=current_user.id, role="user", text=request_body.message)
+    # Committing here also returns the connection to the pool while we wait on the LLM
+    user_msg_db = models.ChatMessage(user_id=user_id, role="user", text=message)
     db.add(user_msg_db)
-    
-    # 4. Get AI response with full history AND deep state context
-    response_text = get_counsellor_response(context, request_body.message, history=history)
-    actions = parse_actions(response_text)
-    
+    db.commit()
+
+    return prompt
+
+def execute_actions(user_id: int, actions: list, db: Session):
+    """
+    Applies the [ACTION] tags parsed from the counsellor's reply.
+    Returns a human readable line per executed action.
+    """
     executed_actions = []
+    if not actions:
+        return executed_actions
+
+    profile = db.query(models.Profile).filter(models.Profile.user_id == user_id).first()
+    tasks = db.query(models.Task).filter(models.Task.user_id == user_id).all()
+
     for action in actions:
         if action["type"] == "shortlist":
             uni_name = action["university"]
             category = action.get("category", "Target")
-            uni = db.query(models.University).filter(models.University.name == uni_name).first()
+            uni = db.query(models.University).filter(models.University.normalized_name == normalize_text(uni_name)).first()
             if not uni:
-                uni = models.University(name=uni_name, country="USA", tuition_fee="Unknown", acceptance_rate=0.0)
+                # Placeholder, like POST /universities/shortlist: no stats, never recommended
+                uni = models.University(name=uni_name, country="USA")
                 db.add(uni)
                 db.commit()
                 db.refresh(uni)
             
             existing = db.query(models.Shortlist).filter(
-                models.Shortlist.user_id == current_user.id,
+                models.Shortlist.user_id == user_id,
                 models.Shortlist.university_id == uni.id
             ).first()
             if not existing:
-                new_item = models.Shortlist(user_id=current_user.id, university_id=uni.id, category=category)
+                new_item = models.Shortlist(user_id=user_id, university_id=uni.id, category=category)
                 db.add(new_item)
                 # Advance stage
                 if profile and (profile.current_stage == "Building Profile" or profile.current_stage == "Stage 2: Discovering Universities"):
                     profile.current_stage = "Stage 3: Finalizing Universities"
-                    sync_stage_tasks(current_user.id, profile.current_stage, db)
+                    ensure_stage_tasks(profile, db)
                 executed_actions.append(f"Shortlisted {uni_name} to {category} list")
         
         elif action["type"] == "add_task":
             # Avoid duplicate tasks by title
             existing_task = any(t.title.lower() == action["title"].lower() for t in tasks)
             if not existing_task:
-                new_task = models.Task(user_id=current_user.id, title=action["title"], is_auto_generated=True)
+                new_task = models.Task(user_id=user_id, title=action["title"], is_auto_generated=True)
                 db.add(new_task)
                 executed_actions.append(f"Added task: {action['title']}")
         
         elif action["type"] == "lock":
             uni_name = action["university"]
-            uni = db.query(models.University).filter(models.University.name == uni_name).first()
+            uni = db.query(models.University).filter(models.University.normalized_name == normalize_text(uni_name)).first()
             if uni:
                 shortlist_item = db.query(models.Shortlist).filter(
-                    models.Shortlist.user_id == current_user.id,
+                    models.Shortlist.user_id == user_id,
                     models.Shortlist.university_id == uni.id
                 ).first()
                 if shortlist_item and not shortlist_item.is_locked:
@@ -136,24 +221,100 @@ async def chat_with_counsellor(request: Request, request_body: ChatRequest, curr
                     # Update profile stage to Applications if not already
                     if profile and profile.current_stage != "Stage 4: Preparing Applications":
                         profile.current_stage = "Stage 4: Preparing Applications"
-                        sync_stage_tasks(current_user.id, profile.current_stage, db)
+                        ensure_stage_tasks(profile, db)
                     executed_actions.append(f"Locked {uni_name} - Welcome to the Application phase!")
-    
-    # Clean up the [ACTION] tags
-    import re
-    clean_text = re.sub(r'\[ACTION:.*?\]', '', response_text, flags=re.DOTALL).strip()
+
+    return executed_actions
+
+def save_turn_result(user_id: int, response_text: str, db: Session):
+    """
+    Executes the reply's actions and stores the bot response. Runs in the threadpool.
+    """
+    executed_actions = execute_actions(user_id, parse_actions(response_text), db)
+    clean_text = strip_actions(response_text)
     
     # 5. Save bot response and actions to DB
-    bot_msg_db = models.ChatMessage(user_id=current_user.id, role="bot", text=clean_text)
+    bot_msg_db = models.ChatMessage(user_id=user_id, role="bot", text=clean_text)
     db.add(bot_msg_db)
     
     for action_text in executed_actions:
-        action_msg_db = models.ChatMessage(user_id=current_user.id, role="bot", text=action_text, is_action=True)
+        action_msg_db = models.ChatMessage(user_id=user_id, role="bot", text=action_text, is_action=True)
         db.add(action_msg_db)
         
     db.commit()
+    if executed_actions:
+        invalidate_student_snapshot(user_id)
+    return clean_text, executed_actions
+
+@router.post("")
+@limiter.limit("10/minute")
+async def chat_with_counsellor(request: Request, request_body: ChatRequest, background_tasks: BackgroundTasks, current_user: Principal = Depends(get_current_user), db: Session = Depends(database.get_db)):
+    # DB work is blocking, so it runs in the threadpool; only the provider call is awaited on the loop
+    user_id = current_user.id
+    prompt = await run_in_threadpool(build_turn_context, user_id, request_body.message, db)
+    
+    # 4. Get AI response with the budgeted history AND deep state context
+    response_text = await get_counsellor_response(prompt.context, request_body.message, history=prompt.history)
+    
+    clean_text, executed_actions = await run_in_threadpool(save_turn_result, user_id, response_text or "", db)
+    background_tasks.add_task(refresh_conversation_summary, user_id)
     
     return {
         "response": clean_text,
-        "actions_taken": executed_actions
+        "actions_taken": executed_actions,
+        "prompt_tokens": prompt.prompt_tokens
     }
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def save_stream_result(user_id: int, response_text: str):
+    # The request scoped session may already be closed once the response is streaming, use a fresh one
+    db = database.SessionLocal()
+    try:
+        return save_turn_result(user_id, response_text, db)
+    finally:
+        db.close()
+
+@router.post("/stream")
+@limiter.limit("10/minute")
+async def stream_chat_with_counsellor(request: Request, request_body: ChatRequest, background_tasks: BackgroundTasks, current_user: Principal = Depends(get_current_user), db: Session = Depends(database.get_db)):
+    """
+    Server-Sent Events variant of the counsellor chat.
+    Emits `token` events while the reply is generated ([ACTION] tags are hidden),
+    then a final `done` event with the same payload as POST /api/chat.
+    """
+    user_id = current_user.id
+    prompt = await run_in_threadpool(build_turn_context, user_id, request_body.message, db)
+    # Runs once the stream has been fully sent
+    background_tasks.add_task(refresh_conversation_summary, user_id)
+
+    async def event_stream():
+        action_filter = ActionStreamFilter()
+        chunks = []
+        async for delta in stream_counsellor_response(prompt.context, request_body.message, history=prompt.history):
+            chunks.append(delta)
+            visible = action_filter.feed(delta)
+            if visible:
+                yield sse_event("token", {"text": visible})
+
+        rest = action_filter.flush()
+        if rest:
+            yield sse_event("token", {"text": rest})
+
+        # Actions only run once the full reply (and every tag in it) is known
+        try:
+            clean_text, executed_actions = await run_in_threadpool(save_stream_result, user_id, "".join(chunks))
+        except Exception as e:
+            print(f"Chat stream save error: {e}")
+            yield sse_event("error", {"detail": "Could not save the conversation"})
+            return
+
+        yield sse_event("done", {"response": clean_text, "actions_taken": executed_actions, "prompt_tokens": prompt.prompt_tokens})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=background_tasks,
+    )
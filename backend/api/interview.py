@@ -1,235 +1,224 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from datetime import timedelta
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from pydantic import BaseModel, Field
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from models import models, database
-from utils.auth import get_current_user
-from services.ai_service import get_gemini_client, get_groq_client, GROQ_MODEL, GEMINI_MODEL
+from utils.auth import get_current_user, Principal, create_scoped_token, decode_scoped_token
+from services.ai_service import SentenceChunker
+from services.interview_service import (
+    INTERVIEW_MODES, get_locked_university, get_target_country, start_interview_session,
+    get_active_session, run_interview_turn, stream_interview_turn, end_interview_session, interview_phase,
+)
 import json
+import os
+import time
 
 router = APIRouter()
 
-class InterviewChatRequest(BaseModel):
-    message: str
+# Lifetime of the token a client opens the interview WebSocket with; covers a 5 minute interview with margin
+INTERVIEW_SOCKET_TOKEN_MINUTES = int(os.getenv("INTERVIEW_SOCKET_TOKEN_MINUTES", "15"))
+SOCKET_TOKEN_SCOPE = "interview_socket"
+
+INTERVIEW_HISTORY_PAGE_SIZE = int(os.getenv("INTERVIEW_HISTORY_PAGE_SIZE", "20"))
+INTERVIEW_HISTORY_MAX_PAGE_SIZE = int(os.getenv("INTERVIEW_HISTORY_MAX_PAGE_SIZE", "100"))
+
+class InterviewSessionRequest(BaseModel):
     mode: str # "university" or "visa"
-    history: list = [] # List of {role, text}
+
+class InterviewTurnRequest(BaseModel):
+    message: str # Only the new answer; earlier turns are stored with the session
+    elapsed_seconds: Optional[int] = Field(None, ge=0) # Visa interviews are timed
+
+# This router uses the async session: its queries are awaited on the event loop, no threadpool hop
 
 @router.get("/status")
-def get_interview_status(current_user: models.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
+async def get_interview_status(current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(database.get_async_db)):
     """
     Returns the status for enabling interview modes.
     - locked_university: Name of the locked university (if any).
     - target_country: Preferred country for visa interview.
     """
-    # Check for locked university
-    locked_shortlist = db.query(models.Shortlist).join(models.University).filter(
-        models.Shortlist.user_id == current_user.id,
-        models.Shortlist.is_locked == True
-    ).first()
-    
-    # Priority for target_country:
-    # 1. Country of the locked university
-    # 2. First country in preferred_countries
-    # 3. Default to USA
-    
-    target_country = "USA"
-    if locked_shortlist:
-        target_country = locked_shortlist.university.country
-    else:
-        profile = db.query(models.Profile).filter(models.Profile.user_id == current_user.id).first()
-        if profile and profile.preferred_countries:
-            try:
-                countries = profile.preferred_countries
-                if isinstance(countries, list) and len(countries) > 0:
-                    target_country = countries[0]
-            except:
-                pass
-
+    locked = await get_locked_university(current_user.id, db)
     return {
-        "locked_university": locked_shortlist.university.name if locked_shortlist else None,
-        "locked_university_id": locked_shortlist.university_id if locked_shortlist else None,
-        "target_country": target_country,
-        "can_take_university_interview": locked_shortlist is not None
+        "locked_university": locked.name if locked else None,
+        "locked_university_id": locked.id if locked else None,
+        "target_country": await get_target_country(current_user.id, locked, db),
+        "can_take_university_interview": locked is not None
     }
 
-@router.post("/chat")
-def interview_chat(req: InterviewChatRequest, current_user: models.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
+async def require_active_session(session_id: int, user_id: int, db: AsyncSession):
+    session = await get_active_session(session_id, user_id, db)
+    if session is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Interview session not found or already ended")
+    return session
+
+@router.post("/sessions")
+async def create_interview_session(req: InterviewSessionRequest, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(database.get_async_db)):
+    """
+    Starts a mock interview. Returns the session id, the officer's greeting (the first turn)
+    and the socket_token for the session's WebSocket.
+    """
+    if req.mode not in INTERVIEW_MODES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Mode must be one of: {', '.join(INTERVIEW_MODES)}")
+    session = await start_interview_session(current_user.id, req.mode, db)
+    # The socket may go straight to the API host, where the auth cookie isn't sent
+    session["socket_token"] = create_scoped_token(
+        current_user.id, SOCKET_TOKEN_SCOPE, timedelta(minutes=INTERVIEW_SOCKET_TOKEN_MINUTES), sid=session["session_id"]
+    )
+    return session
+
+@router.post("/sessions/{session_id}/turns")
+async def interview_turn(session_id: int, req: InterviewTurnRequest, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(database.get_async_db)):
     """
     Specialized chat endpoint for mock interviews.
-    Generates a response based on the specific persona (University Admissions Officer or Visa Officer).
+    Stores the student's answer and replies in the session's persona (University Admissions Officer or Visa Officer).
     """
-    
-    system_prompt = ""
-    
-    if req.mode == "university":
-        # Fetch locked university
-        locked = db.query(models.Shortlist).join(models.University).filter(
-            models.Shortlist.user_id == current_user.id,
-            models.Shortlist.is_locked == True
-        ).first()
-        
-        uni_name = locked.university.name if locked else "a prestigious university"
-        uni_country = locked.university.country if locked else "the USA"
-        
-        system_prompt = f"""
-        You are a strict but fair Admissions Officer at **{uni_name}** in {uni_country}.
-        You are conducting a formal admissions interview with a prospective student.
-        
-        YOUR GOAL:
-        - Verify their passion for the field.
-        - Test their knowledge about {uni_name}.
-        - assess their fit for the program.
-        
-        GUIDELINES:
-        - Speak conversationally but professionally.
-        - Ask ONE question at a time.
-        - Keep responses concise (spoken speech is shorter than written text).
-        - If the student gives a good answer, acknowledge it briefly and move to a follow-up or next topic.
-        - If the answer is vague, press for details.
-        
-        Start by responding to their greeting or answer.
-        """
-        
-    elif req.mode == "visa":
-        # Priority for country:
-        # 1. Country of the locked university
-        # 2. First country in preferred_countries
-        # 3. Default to USA
-        
-        locked = db.query(models.Shortlist).join(models.University).filter(
-            models.Shortlist.user_id == current_user.id,
-            models.Shortlist.is_locked == True
-        ).first()
-        
-        country = "USA"
-        if locked:
-            country = locked.university.country
-        else:
-            profile = db.query(models.Profile).filter(models.Profile.user_id == current_user.id).first()
-            if profile and profile.preferred_countries:
-                if isinstance(profile.preferred_countries, list) and len(profile.preferred_countries) > 0:
-                    country = profile.preferred_countries[0]
-                
-        system_prompt = f"""
-        You are a Visa Consular Officer for **{country}**.
-        You are conducting a visa interview.
-        
-        YOUR GOAL:
-        - Determine if the student is a genuine student.
-        - Assess their financial stability and intent to return (if applicable).
-        - Verify their ties to their home country.
-        
-        CRITICAL CONSTRAINT:
-        - This interview is strictly time-bound to 5 minutes.
-        - If the message includes [Time: >4 mins], start concluding the interview.
-        - If the message includes [Time: >5 mins], you MUST give a final verdict (Approved or Rejected) and end the conversation.
-        
-        GUIDELINES:
-        - Be professional, somewhat skeptical, and direct.
-        - Ask clear, specific questions (e.g., "Why this university?", "Who is sponsoring you?").
-        - Keep responses short.
-        - If the student's answer is suspicious or weak, grill them further.
-        
-        Start by responding to the student.
-        """
-        if locked:
-            system_prompt += f"\nYou know the student is planning to attend {locked.university.name}."
-
-    else:
-        system_prompt = "You are a generic interviewer."
-
-    # Construct the full context
-    full_context = f"{system_prompt}\n\n[INSTRUCTIONS]: Response should be suitable for Text-to-Speech (no markdown, no bolding, no emojis, just plain text)."
-    
-    # Try Groq first for speed
-    try:
-        from services.ai_service import get_groq_client, GROQ_MODEL
-        client = get_groq_client()
-        if client:
-            messages = [{"role": "system", "content": full_context}]
-            # Add history
-            for msg in req.history:
-                role = "assistant" if msg["role"] == "model" else msg["role"]
-                messages.append({"role": role, "content": msg["text"]})
-            messages.append({"role": "user", "content": req.message})
-            
-            chat_completion = client.chat.completions.create(
-                messages=messages,
-                model=GROQ_MODEL,
-                temperature=0.7 # Slight callback variance
-            )
-            return {"response": chat_completion.choices[0].message.content}
-    except Exception as e:
-        print(f"Groq Interview Error: {e}")
-
-    # Fallback to Gemini
-    try:
-        from services.ai_service import get_gemini_client, GEMINI_MODEL
-        client = get_gemini_client()
-        if client:
-            # Construct simple history prompt
-            history_str = ""
-            for msg in req.history:
-                history_str += f"{msg['role'].upper()}: {msg['text']}\n"
-            
-            final_prompt = f"{full_context}\n\n[CONVERSATION SO FAR]\n{history_str}\nUSER: {req.message}"
-            
-            response = client.models.generate_content(
-                model=GEMINI_MODEL,
-                contents=final_prompt
-            )
-            return {"response": response.text}
-    except Exception as e:
-        return {"response": "I apologize, could you repeat that?"}
-
-@router.post("/save")
-def save_interview_log(req: dict, current_user: models.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
+    session = await require_active_session(session_id, current_user.id, db)
+    return {"response": await run_interview_turn(session, req.message, req.elapsed_seconds, db)}
+
+@router.post("/sessions/{session_id}/end")
+async def end_interview(session_id: int, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(database.get_async_db)):
     """
-    Saves the full transcript to history.
-    req body: { "transcript": "...", "mode": "..." }
+    Ends the session and saves the transcript, assembled from the stored turns, to history.
     """
-    transcript = req.get("transcript", "")
-    mode = req.get("mode", "Interaction")
-    
-    uni_id = None
-    if mode == "university":
-         # Find locked uni
-         locked = db.query(models.Shortlist).filter(
-            models.Shortlist.user_id == current_user.id,
-            models.Shortlist.is_locked == True
-         ).first()
-         if locked:
-             uni_id = locked.university_id
-
-    # Create Interview Log
-    interview = models.Interview(
-        user_id=current_user.id,
-        interview_type=mode,
-        transcript=transcript,
-        university_id=uni_id
-    )
-    db.add(interview)
-    db.commit()
-    
+    await require_active_session(session_id, current_user.id, db)
+    await end_interview_session(session_id, db)
     return {"message": "Saved"}
 
+async def stream_officer_reply(websocket: WebSocket, session, text: str, elapsed_seconds: int):
+    # Sentences go out as soon as they are complete, so text-to-speech starts on the first one
+    chunker = SentenceChunker()
+    chunks = []
+    index = 0
+    async with database.AsyncSessionLocal() as db:
+        async for delta in stream_interview_turn(session, text, elapsed_seconds, db):
+            chunks.append(delta)
+            for sentence in chunker.feed(delta):
+                await websocket.send_json({"type": "sentence", "index": index, "text": sentence})
+                index += 1
+    for sentence in chunker.flush():
+        await websocket.send_json({"type": "sentence", "index": index, "text": sentence})
+        index += 1
+    await websocket.send_json({"type": "done", "response": "".join(chunks)})
+
+@router.websocket("/sessions/{session_id}/ws")
+async def interview_socket(websocket: WebSocket, session_id: int, token: str = ""):
+    """
+    Voice mode channel of a session, opened with ?token=<socket_token>. JSON messages both ways.
+    Client: {"type": "answer", "text", "elapsed_seconds"?} and {"type": "end"}.
+    Server, per answer: {"type": "time", "elapsed_seconds", "phase"} in visa mode, one
+    {"type": "sentence", "index", "text"} per sentence of the reply as it is generated, then
+    {"type": "done", "response"}. {"type": "ended"} after "end", {"type": "error", "detail"} for bad messages.
+    Closes with 1008 on an answer once the session has ended or the token has expired.
+    """
+    claims = decode_scoped_token(token, SOCKET_TOKEN_SCOPE)
+    session = None
+    if claims is not None and claims.get("sid") == session_id:
+        async with database.AsyncSessionLocal() as db:
+            session = await get_active_session(session_id, int(claims["sub"]), db)
+    if session is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    opened = time.monotonic()
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                message = None
+            kind = message.get("type") if isinstance(message, dict) else None
+
+            if kind == "end":
+                async with database.AsyncSessionLocal() as db:
+                    await end_interview_session(session_id, db)
+                await websocket.send_json({"type": "ended"})
+                await websocket.close()
+                return
+
+            text = str(message.get("text") or "").strip() if kind == "answer" else ""
+            if not text:
+                await websocket.send_json({"type": "error", "detail": 'Expected {"type": "answer", "text": ...} or {"type": "end"}'})
+                continue
+
+            # The session may have been ended over HTTP meanwhile, and the token may have run out
+            session = None
+            if claims.get("exp", 0) > time.time():
+                async with database.AsyncSessionLocal() as db:
+                    session = await get_active_session(session_id, int(claims["sub"]), db)
+            if session is None:
+                await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+                return
+
+            # The client's timer is what the student sees; the socket's own clock is the fallback
+            elapsed = message.get("elapsed_seconds")
+            if type(elapsed) is not int or elapsed < 0:
+                elapsed = int(time.monotonic() - opened)
+            if session.interview_type == "visa":
+                await websocket.send_json({"type": "time", "elapsed_seconds": elapsed, "phase": interview_phase(elapsed)})
+            await stream_officer_reply(websocket, session, text, elapsed)
+    except WebSocketDisconnect:
+        # The session stays active; the client can still end it over HTTP
+        pass
+
+def history_columns():
+    # Metadata and the stored preview only; the transcript is fetched per interview. University by join, not lazy load.
+    interview = models.Interview
+    return (
+        select(
+            interview.id, interview.interview_type, interview.created_at, interview.preview,
+            models.University.name.label("university_name"),
+        )
+        .outerjoin(models.University, models.University.id == interview.university_id)
+    )
+
+def history_item(row) -> dict:
+    return {
+        "id": row.id,
+        "mode": row.interview_type,
+        "date": row.created_at.isoformat() if row.created_at else None,
+        "transcript_preview": row.preview or "",
+        "university_name": row.university_name or "N/A"
+    }
+
 @router.get("/history")
-def get_interview_history(mode: str = None, current_user: models.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
-    query = db.query(models.Interview).filter(models.Interview.user_id == current_user.id)
-    
+async def get_interview_history(
+    mode: str = None,
+    before: Optional[int] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(INTERVIEW_HISTORY_PAGE_SIZE, ge=1, le=INTERVIEW_HISTORY_MAX_PAGE_SIZE),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    """
+    Completed interviews, newest first: {"interviews": [...], "next_cursor"}. Pass next_cursor
+    as `before` for the next page (keyset on (created_at, id), like the chat history).
+    """
+    interview = models.Interview
+    query = history_columns().where(interview.user_id == current_user.id, interview.status == "completed")
     if mode:
-        query = query.filter(models.Interview.interview_type == mode)
-        
-    # Join with University if needed
-    results = query.order_by(models.Interview.created_at.desc()).all()
-    
-    history_list = []
-    for item in results:
-        history_list.append({
-            "id": item.id,
-            "mode": item.interview_type,
-            "date": item.created_at.isoformat(),
-            "transcript_preview": item.transcript[:200] + "..." if item.transcript else "",
-            "full_transcript": item.transcript,
-            "university_name": item.university.name if item.university else "N/A"
-        })
-    return history_list
+        query = query.where(interview.interview_type == mode)
+    if before is not None:
+        anchor = select(interview.created_at).where(interview.id == before, interview.user_id == current_user.id).scalar_subquery()
+        query = query.where(tuple_(interview.created_at, interview.id) < tuple_(anchor, before))
+
+    rows = (await db.execute(query.order_by(interview.created_at.desc(), interview.id.desc()).limit(limit + 1))).all()
+    return {
+        "interviews": [history_item(row) for row in rows[:limit]],
+        "next_cursor": rows[limit - 1].id if len(rows) > limit else None,
+    }
+
+@router.get("/history/{interview_id}")
+async def get_interview_transcript(interview_id: int, current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(database.get_async_db)):
+    """One completed interview with its full transcript."""
+    interview = models.Interview
+    row = (await db.execute(
+        history_columns()
+        .add_columns(interview.transcript)
+        .where(interview.id == interview_id, interview.user_id == current_user.id, interview.status == "completed")
+    )).first()
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Interview not found")
+    return {**history_item(row), "transcript": row.transcript or ""}
@@ -1,10 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
+from sqlalchemy import case
 from sqlalchemy.orm import Session
 from models import models, database
-from services.task_service import sync_stage_tasks
+from services.task_service import ensure_stage_tasks
+from services.snapshot_cache import invalidate_student_snapshot
+from services.recommendation_cache import invalidate_recommendation_profile
+from services.university_service import recommendation_profile
 from typing import Optional, List, Dict
-from utils.auth import get_current_user
+from utils.auth import get_current_user, Principal
 
 router = APIRouter()
 
@@ -28,8 +32,11 @@ class ProfileUpdate(BaseModel):
 class ReorderTasksRequest(BaseModel):
     task_ids: List[int]
 
+class MoveTaskRequest(BaseModel):
+    index: int
+
 @router.get("/me")
-def get_own_profile(current_user: models.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
+def get_own_profile(current_user: Principal = Depends(get_current_user), db: Session = Depends(database.get_db)):
     profile = db.query(models.Profile).filter(models.Profile.user_id == current_user.id).first()
     if not profile:
         # Should not happen if checking registration, but auto-create just in case
@@ -37,61 +44,119 @@ def get_own_profile(current_user: models.User = Depends(get_current_user), db: S
         db.add(profile)
         db.commit()
         db.refresh(profile)
+        ensure_stage_tasks(profile, db)
     
     res = {column.name: getattr(profile, column.name) for column in profile.__table__.columns}
     res["email"] = current_user.email
     return res
 
 @router.put("/me")
-def update_own_profile(profile_data: ProfileUpdate, current_user: models.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
+def update_own_profile(profile_data: ProfileUpdate, current_user: Principal = Depends(get_current_user), db: Session = Depends(database.get_db)):
     profile = db.query(models.Profile).filter(models.Profile.user_id == current_user.id).first()
     if not profile:
         profile = models.Profile(user_id=current_user.id)
         db.add(profile)
         db.commit()
     
+    scoring_before = recommendation_profile(profile)
     for key, value in profile_data.dict(exclude_unset=True).items():
         setattr(profile, key, value)
     
     db.commit()
     db.refresh(profile)
+    invalidate_student_snapshot(current_user.id)
+    if recommendation_profile(profile) != scoring_before:
+        invalidate_recommendation_profile(current_user.id)
     
-    # Sync tasks for the new stage
-    sync_stage_tasks(current_user.id, profile.current_stage, db)
+    # Sync tasks only if the stage actually changed (or was never synced)
+    ensure_stage_tasks(profile, db)
     
     return profile
 
 @router.get("/tasks")
-def get_tasks(current_user: models.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
-    # First sync tasks to ensure they match current stage
-    profile = db.query(models.Profile).filter(models.Profile.user_id == current_user.id).first()
-    if profile:
-        sync_stage_tasks(current_user.id, profile.current_stage, db)
-        
+def get_tasks(current_user: Principal = Depends(get_current_user), db: Session = Depends(database.get_db)):
+    # Stage tasks are synced when the stage changes, so reading is a single SELECT
     # Sort: Pending first, then by position
-    tasks = db.query(models.Task).filter(models.Task.user_id == current_user.id).order_by(
-        models.Task.status.desc(), # 'Pending' > 'Completed' alphabetically, but we need custom or just rely on frontend
+    return db.query(models.Task).filter(
+        models.Task.user_id == current_user.id,
+        models.Task.status.in_(["Pending", "Completed"])
+    ).order_by(
+        case((models.Task.status == "Pending", 0), else_=1),
         models.Task.position.asc(), 
         models.Task.created_at.desc()
     ).all()
-    
-    # Simple manual sort to ensure Pending is always first regardless of case/alphabet
-    pending = [t for t in tasks if t.status == "Pending"]
-    completed = [t for t in tasks if t.status == "Completed"]
-    return pending + completed
 
 @router.put("/tasks/reorder")
-def reorder_tasks(req: ReorderTasksRequest, current_user: models.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
-    for index, task_id in enumerate(req.task_ids):
-        # Validation: check task ownership
-        task = db.query(models.Task).filter(models.Task.id == task_id, models.Task.user_id == current_user.id).first()
-        if task:
-            task.position = index
+def reorder_tasks(req: ReorderTasksRequest, current_user: Principal = Depends(get_current_user), db: Session = Depends(database.get_db)):
+    if not req.task_ids:
+        return {"message": "Reordering successful", "updated": 0}
+
+    positions = {task_id: index for index, task_id in enumerate(req.task_ids)}
+    # Single UPDATE ... SET position = CASE id WHEN .. THEN .. END
+    # Validation: the user_id filter is the ownership check, other users' ids just don't match
+    updated = db.query(models.Task).filter(
+        models.Task.user_id == current_user.id,
+        models.Task.id.in_(positions.keys())
+    ).update(
+        {models.Task.position: case(positions, value=models.Task.id)},
+        synchronize_session=False
+    )
+    db.commit()
+    # Positions aren't part of the chat snapshot, so no invalidation needed
+    return {"message": "Reordering successful", "updated": updated}
+
+@router.put("/tasks/{task_id}/move")
+def move_task(task_id: int, req: MoveTaskRequest, current_user: Principal = Depends(get_current_user), db: Session = Depends(database.get_db)):
+    """
+    Moves one task to `index` (clamped to the list), shifting only the tasks between its old and new
+    position. Positions are renumbered 0..n-1 in the /tasks order first if they aren't dense yet
+    (new tasks start at position 0 until the list is reordered).
+    """
+    task = db.query(models.Task).filter(models.Task.id == task_id, models.Task.user_id == current_user.id).first()
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    ordered = db.query(models.Task.id, models.Task.position).filter(models.Task.user_id == current_user.id).order_by(
+        case((models.Task.status == "Pending", 0), else_=1),
+        models.Task.position.asc(),
+        models.Task.created_at.desc(),
+        models.Task.id.asc()
+    ).all()
+    if [row.position for row in ordered] != list(range(len(ordered))):
+        # Same single CASE update as /tasks/reorder
+        positions = {row.id: index for index, row in enumerate(ordered)}
+        db.query(models.Task).filter(models.Task.user_id == current_user.id).update(
+            {models.Task.position: case(positions, value=models.Task.id)},
+            synchronize_session=False
+        )
+        task.position = positions[task_id]
+
+    old_index = task.position
+    new_index = min(max(0, req.index), len(ordered) - 1)
+    if new_index == old_index:
+        db.commit()
+        return {"message": "Task moved", "updated": 0}
+
+    shifted = db.query(models.Task).filter(models.Task.user_id == current_user.id, models.Task.id != task_id)
+    if new_index > old_index:
+        # Moving down: everything in (old, new] moves up one slot
+        updated = shifted.filter(
+            models.Task.position > old_index,
+            models.Task.position <= new_index
+        ).update({models.Task.position: models.Task.position - 1}, synchronize_session=False)
+    else:
+        # Moving up: everything in [new, old) moves down one slot
+        updated = shifted.filter(
+            models.Task.position >= new_index,
+            models.Task.position < old_index
+        ).update({models.Task.position: models.Task.position + 1}, synchronize_session=False)
+
+    task.position = new_index
     db.commit()
-    return {"message": "Reordering successful"}
+    return {"message": "Task moved", "updated": updated + 1}
 
 @router.put("/tasks/{task_id}/toggle")
-def toggle_task(task_id: int, current_user: models.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
+def toggle_task(task_id: int, current_user: Principal = Depends(get_current_user), db: Session = Depends(database.get_db)):
     task = db.query(models.Task).filter(models.Task.id == task_id, models.Task.user_id == current_user.id).first()
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
@@ -103,5 +168,6 @@ def toggle_task(task_id: int, current_user: models.User = Depends(get_current_us
         task.status = "Completed"
         
     db.commit()
+    invalidate_student_snapshot(current_user.id)
     db.refresh(task)
     return {"message": "Task status updated", "new_status": task.status}
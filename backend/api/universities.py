@@ -1,21 +1,32 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from services.university_service import search_universities, get_ai_recommendations
-from services.task_service import sync_stage_tasks
+from fastapi.concurrency import run_in_threadpool
+from services.university_service import search_universities, get_ai_recommendations, recommendation_profile
+from services.task_service import ensure_stage_tasks
+from services.snapshot_cache import invalidate_student_snapshot
+from services.recommendation_cache import get_recommendation_profile, set_recommendation_profile
 from models import database, models
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from utils.auth import get_current_user
+from utils.auth import get_current_user, Principal
+from utils.text import normalize_text
 
 router = APIRouter()
 
+def recommend_for_user(user_id: int, db: Session):
+    profile = get_recommendation_profile(user_id)
+    if profile is None:
+        profile = recommendation_profile(db.query(models.Profile).filter(models.Profile.user_id == user_id).first())
+        set_recommendation_profile(user_id, profile)
+    return get_ai_recommendations(profile)
+
 @router.get("")
-async def get_universities(query: str = "", recommend: bool = False, current_user: models.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
+async def get_universities(query: str = "", recommend: bool = False, current_user: Principal = Depends(get_current_user), db: Session = Depends(database.get_db)):
     if recommend:
-        # Pass the user profile for better context in real app
-        return {"recommendations": get_ai_recommendations({})}
+        return {"recommendations": await run_in_threadpool(recommend_for_user, current_user.id, db)}
 
     # In a real app we might cache or store in DB first
-    results = search_universities(query)
+    results = await search_universities(query)
     return {"results": results}
 
 class ShortlistRequest(BaseModel):
@@ -23,29 +34,44 @@ class ShortlistRequest(BaseModel):
     category: str = "Target"
 
 @router.post("/shortlist")
-def add_to_shortlist(req: ShortlistRequest, current_user: models.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
-    # Check if exists
-    uni = db.query(models.University).filter(models.University.name == req.university_name).first()
+def add_to_shortlist(req: ShortlistRequest, current_user: Principal = Depends(get_current_user), db: Session = Depends(database.get_db)):
+    # Check if exists (by normalized name, the same key the catalog importer upserts on)
+    uni = db.query(models.University).filter(models.University.normalized_name == normalize_text(req.university_name)).first()
     if not uni:
-        uni = models.University(name=req.university_name, country="USA", tuition_fee="50000", acceptance_rate=0.05)
+        # Placeholder for a name not in the catalog: no made-up stats, so it is never recommended to anyone
+        uni = models.University(name=req.university_name, country="USA")
         db.add(uni)
         db.commit()
         db.refresh(uni)
     
+    existing = db.query(models.Shortlist.id).filter(
+        models.Shortlist.user_id == current_user.id,
+        models.Shortlist.university_id == uni.id
+    ).first()
+    if existing:
+        return {"message": "Already shortlisted"}
+
     item = models.Shortlist(user_id=current_user.id, university_id=uni.id, category=req.category)
     db.add(item)
+    try:
+        db.flush()
+    except IntegrityError:
+        # A concurrent request shortlisted it first (unique user_id, university_id)
+        db.rollback()
+        return {"message": "Already shortlisted"}
     
     # Advance stage to Stage 3 if currently at Stage 2
     profile = db.query(models.Profile).filter(models.Profile.user_id == current_user.id).first()
     if profile and (profile.current_stage == "Building Profile" or profile.current_stage == "Stage 2: Discovering Universities"):
         profile.current_stage = "Stage 3: Finalizing Universities"
-        sync_stage_tasks(current_user.id, profile.current_stage, db)
+        ensure_stage_tasks(profile, db)
         
     db.commit()
+    invalidate_student_snapshot(current_user.id)
     return {"message": "Shortlisted"}
 
 @router.get("/shortlist")
-def get_shortlist(current_user: models.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
+def get_shortlist(current_user: Principal = Depends(get_current_user), db: Session = Depends(database.get_db)):
     # Join with University to get names
     items = (
         db.query(models.Shortlist, models.University)
@@ -66,7 +92,7 @@ def get_shortlist(current_user: models.User = Depends(get_current_user), db: Ses
     return result
 
 @router.post("/lock/{shortlist_id}")
-def lock_university(shortlist_id: int, current_user: models.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
+def lock_university(shortlist_id: int, current_user: Principal = Depends(get_current_user), db: Session = Depends(database.get_db)):
     item = db.query(models.Shortlist).filter(
         models.Shortlist.id == shortlist_id,
         models.Shortlist.user_id == current_user.id  # Ownership check
@@ -80,12 +106,13 @@ def lock_university(shortlist_id: int, current_user: models.User = Depends(get_c
     user_profile = db.query(models.Profile).filter(models.Profile.user_id == current_user.id).first()
     if user_profile:
         user_profile.current_stage = "Stage 4: Preparing Applications"
-        sync_stage_tasks(current_user.id, user_profile.current_stage, db)
+        ensure_stage_tasks(user_profile, db)
     db.commit()
+    invalidate_student_snapshot(current_user.id)
     return {"message": "Locked"}
 
 @router.post("/unlock/{shortlist_id}")
-def unlock_university(shortlist_id: int, current_user: models.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
+def unlock_university(shortlist_id: int, current_user: Principal = Depends(get_current_user), db: Session = Depends(database.get_db)):
     item = db.query(models.Shortlist).filter(
         models.Shortlist.id == shortlist_id,
         models.Shortlist.user_id == current_user.id # Ownership check
@@ -99,4 +126,5 @@ def unlock_university(shortlist_id: int, current_user: models.User = Depends(get
     if user_profile:
         user_profile.current_stage = "Stage 3: Finalizing Universities"
     db.commit()
+    invalidate_student_snapshot(current_user.id)
     return {"message": "Unlocked"}
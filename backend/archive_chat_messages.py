@@ -0,0 +1,26 @@
+"""
+Moves old chat messages from chat_messages to chat_messages_archive (services/chat_archive.py).
+
+    python archive_chat_messages.py
+
+Run it periodically (e.g. nightly cron). It can be stopped and rerun at any time: each batch
+moves its rows in one transaction.
+"""
+from models.database import SessionLocal
+from services.chat_archive import archive_chat_messages, CHAT_HOT_MAX_AGE_DAYS, CHAT_HOT_MESSAGES_PER_USER
+import time
+
+def main():
+    db = SessionLocal()
+    try:
+        started = time.monotonic()
+        moved = archive_chat_messages(db)
+        print(
+            f"Archived {moved} chat messages (older than {CHAT_HOT_MAX_AGE_DAYS} days or beyond the newest "
+            f"{CHAT_HOT_MESSAGES_PER_USER} per user) in {time.monotonic() - started:.1f}s"
+        )
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Builds the compact catalog file (services/compact_catalog.py) from MOCK_DATA and the universities table.
+
+    python build_catalog.py catalog.bin
+
+Point CATALOG_PATH at the file and restart the workers: each one maps it instead of loading
+every University row, and University rows created later are picked up on top of it.
+Rebuild after large imports (import_universities.py).
+"""
+from models.database import SessionLocal
+from models.models import University
+from services.compact_catalog import write_catalog
+from services.search_index import UNIVERSITY_DOC_COLUMNS, university_to_doc
+from services.universities_data import MOCK_DATA
+import os
+import sys
+import time
+
+def build_catalog(path: str) -> int:
+    db = SessionLocal()
+    try:
+        columns = [getattr(University, c) for c in UNIVERSITY_DOC_COLUMNS]
+
+        def docs():
+            yield from MOCK_DATA
+            for uni in db.query(*columns).order_by(University.id).yield_per(1000):
+                yield university_to_doc(uni)
+
+        started = time.monotonic()
+        rows = write_catalog(path, docs())
+        print(f"Wrote {rows} universities to {path} ({os.path.getsize(path) / 1e6:.1f} MB) in {time.monotonic() - started:.1f}s")
+        return rows
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    build_catalog(sys.argv[1] if len(sys.argv) > 1 else os.getenv("CATALOG_PATH") or "catalog.bin")
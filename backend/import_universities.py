@@ -0,0 +1,201 @@
+"""
+Streams a CSV or JSONL university dataset into the universities table.
+
+    python import_universities.py data/universities.csv
+    python import_universities.py data/scorecard.jsonl.gz --batch-size 2000
+
+Rows are upserted in batches on University.normalized_name, so re-running an import
+updates rows instead of duplicating them. Progress is checkpointed after every batch
+to <file>.checkpoint; an interrupted import picks up from there (use --restart to ignore it).
+Run migrate.py first on databases that predate the normalized_name column.
+"""
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from models.database import engine
+from models.models import University
+from utils.text import normalize_text
+import argparse
+import csv
+import gzip
+import io
+import itertools
+import json
+import os
+import time
+
+# Accepted column names per field: our own flat names and the College Scorecard ones
+FIELD_ALIASES = {
+    "name": ("name", "school.name", "institution", "university"),
+    "country": ("country", "school.country"),
+    "city": ("city", "school.city", "location"),
+    "state": ("state", "school.state"),
+    "tuition_fee": ("tuition_fee", "tuition", "latest.cost.tuition.out_of_state"),
+    "acceptance_rate": ("acceptance_rate", "admission_rate", "latest.admissions.admission_rate.overall"),
+    "ranking": ("ranking", "rank"),
+    "website": ("website", "url", "school.school_url"),
+}
+
+UPSERT_COLUMNS = ("name", "country", "location", "tuition_fee", "acceptance_rate", "ranking", "details")
+REPORT_EVERY_SECONDS = 2.0
+
+def _field(record: dict, field: str):
+    for alias in FIELD_ALIASES[field]:
+        value = record.get(alias)
+        if value not in (None, ""):
+            return value
+    return None
+
+def _number(value, cast):
+    try:
+        return cast(float(value)) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def to_row(record: dict, default_country: str = None):
+    """Maps one input record onto universities columns; None when it has no usable name."""
+    name = _field(record, "name")
+    key = normalize_text(name)
+    if not key:
+        return None
+
+    city, state, website = _field(record, "city"), _field(record, "state"), _field(record, "website")
+    if website and not str(website).startswith("http"):
+        website = f"https://{website}"
+    acceptance_rate = _number(_field(record, "acceptance_rate"), float)
+    if acceptance_rate is not None and acceptance_rate > 1:
+        acceptance_rate /= 100  # given as a percentage
+    tuition = _field(record, "tuition_fee")
+
+    # details uses the same keys university_to_doc reads back
+    details = {k: v for k, v in (("school.city", city), ("school.state", state), ("website", website)) if v}
+    return {
+        "name": str(name).strip(),
+        "normalized_name": key,
+        "country": _field(record, "country") or default_country,
+        "location": ", ".join(str(part) for part in (city, state) if part) or None,
+        "tuition_fee": str(tuition) if tuition is not None else None,
+        "acceptance_rate": acceptance_rate,
+        "ranking": _number(_field(record, "ranking"), int),
+        "details": details or None,
+    }
+
+def open_records(path: str, fmt: str):
+    """Yields (record, bytes read so far) without loading the file; .gz is decompressed on the fly."""
+    raw = open(path, "rb")
+    stream = gzip.GzipFile(fileobj=raw) if path.endswith(".gz") else raw
+    text_stream = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        if fmt == "csv":
+            for record in csv.DictReader(text_stream):
+                yield record, raw.tell()
+        else:
+            for line in text_stream:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    record = {}  # counted as skipped
+                yield record if isinstance(record, dict) else {}, raw.tell()
+    finally:
+        text_stream.close()
+
+def upsert_statement(dialect: str):
+    insert = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}.get(dialect)
+    if insert is None:
+        raise SystemExit(f"Unsupported database for bulk upserts: {dialect}")
+    stmt = insert(University)
+    # Fields missing from the input keep their current value
+    return stmt.on_conflict_do_update(
+        index_elements=[University.normalized_name],
+        set_={column: func.coalesce(getattr(stmt.excluded, column), getattr(University, column)) for column in UPSERT_COLUMNS},
+    )
+
+def write_batch(conn, stmt, rows: list):
+    # A multi-row upsert may not touch the same row twice, so keep the last record per name.
+    # executemany with one cached statement: psycopg2 pages it into multi-row INSERT ... VALUES
+    # (SQLAlchemy's insertmanyvalues), sqlite runs it through cursor.executemany.
+    unique = {row["normalized_name"]: row for row in rows}
+    conn.execute(stmt, list(unique.values()))
+
+def load_checkpoint(path: str, source: str) -> int:
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        checkpoint = json.load(f)
+    stat = os.stat(source)
+    if checkpoint.get("size") != stat.st_size or checkpoint.get("mtime") != stat.st_mtime:
+        print("Input changed since the checkpoint was written, starting over.")
+        return 0
+    return checkpoint.get("records", 0)
+
+def save_checkpoint(path: str, source: str, records: int):
+    stat = os.stat(source)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"source": source, "size": stat.st_size, "mtime": stat.st_mtime, "records": records}, f)
+    os.replace(tmp_path, path)
+
+def import_universities(path: str, fmt: str = None, batch_size: int = 1000, default_country: str = None, restart: bool = False):
+    fmt = fmt or ("csv" if ".csv" in os.path.basename(path) else "jsonl")
+    checkpoint_path = f"{path}.checkpoint"
+    skip = 0 if restart else load_checkpoint(checkpoint_path, path)
+    total_bytes = os.path.getsize(path)
+    stmt = upsert_statement(engine.dialect.name)
+
+    records = skip
+    written = skipped = 0
+    started = time.monotonic()
+    stream = open_records(path, fmt)
+    if skip:
+        print(f"Resuming after {skip} records")
+        # Skipped records are still parsed, but nothing is written for them
+        for _ in itertools.islice(stream, skip):
+            pass
+
+    batch = []
+    position = 0
+    last_report = started
+    for record, position in stream:
+        records += 1
+        row = to_row(record, default_country)
+        if row is None:
+            skipped += 1
+        else:
+            batch.append(row)
+        if len(batch) >= batch_size:
+            written += _flush(stmt, batch, checkpoint_path, path, records)
+            batch = []
+            if time.monotonic() - last_report >= REPORT_EVERY_SECONDS:
+                last_report = time.monotonic()
+                _report(records, written, skipped, position, total_bytes, started)
+
+    if batch:
+        written += _flush(stmt, batch, checkpoint_path, path, records)
+    _report(records, written, skipped, total_bytes, total_bytes, started)
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    print("Import complete.")
+    return written
+
+def _flush(stmt, batch: list, checkpoint_path: str, path: str, records: int) -> int:
+    # Upserts are idempotent, so a crash between commit and checkpoint only repeats one batch
+    with engine.begin() as conn:
+        write_batch(conn, stmt, batch)
+    save_checkpoint(checkpoint_path, path, records)
+    return len(batch)
+
+def _report(records: int, written: int, skipped: int, position: int, total_bytes: int, started: float):
+    elapsed = max(time.monotonic() - started, 1e-6)
+    percent = f"{position / total_bytes:.0%}" if total_bytes else "?"
+    print(f"- {records} records ({percent} of file), {written} upserted, {skipped} skipped, {written / elapsed:.0f} rows/s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import universities from CSV or JSONL.")
+    parser.add_argument("path", help="CSV or JSONL file, optionally gzipped")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--country", help="country for records that don't have one")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    args = parser.parse_args()
+    import_universities(args.path, args.format, args.batch_size, args.country, args.restart)
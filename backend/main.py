@@ -1,7 +1,15 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from models import models, database
 from api import chat, auth, profile, universities, interview
+from services.ai_service import close_clients, get_provider_router, get_background_router, get_response_cache
+from services.snapshot_cache import snapshot_stats
+from services.recommendation_cache import recommendation_cache_stats
+from services.university_service import load_catalog, warm_recommendation_cache, scorecard_client
+from utils.hashing import password_hasher
+from utils.compression import compression_stats
 from dotenv import load_dotenv
 import os
 from slowapi import _rate_limit_exceeded_handler
@@ -12,7 +20,26 @@ load_dotenv()
 
 models.Base.metadata.create_all(bind=database.engine)
 
-app = FastAPI(title="AI Counsellor API")
+def load_universities():
+    db = database.SessionLocal()
+    try:
+        print(f"Catalog: loaded {load_catalog(db)} universities")
+        print(f"Recommendations: warmed {warm_recommendation_cache(db)} common profiles")
+    finally:
+        db.close()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await run_in_threadpool(load_universities)
+    yield
+    # Release the pooled LLM provider connections and hashing processes of this worker
+    await close_clients()
+    if scorecard_client:
+        await scorecard_client.close()
+    password_hasher.shutdown()
+    await database.async_engine.dispose()
+
+app = FastAPI(title="AI Counsellor API", lifespan=lifespan)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
@@ -36,3 +63,18 @@ app.include_router(interview.router, prefix="/api/interview", tags=["Interview"]
 @app.get("/")
 def read_root():
     return {"message": "AI Counsellor API is running"}
+
+# Per-worker runtime metrics, off by default since they expose internals
+if os.getenv("METRICS_ENABLED", "false").lower() == "true":
+    @app.get("/metrics")
+    def read_metrics():
+        response_cache = get_response_cache()
+        return {
+            "password_hashing": password_hasher.stats(),
+            "llm_providers": get_provider_router().snapshot(),
+            "llm_background_providers": get_background_router().snapshot(),
+            "llm_cache": response_cache.stats() if response_cache else None,
+            "student_snapshots": snapshot_stats(),
+            "recommendations": recommendation_cache_stats(),
+            "text_compression": compression_stats(),
+        }
@@ -1,26 +1,236 @@
-from sqlalchemy import text
+from sqlalchemy import LargeBinary, bindparam, inspect, text
 from models.database import engine
 from models.models import Base
+from utils.compression import compress_text, decompress_text, is_compressed
+from utils.text import normalize_text
+import sys
+
+# Applied revisions are recorded here; each revision runs once, in order, in its own transaction
+MIGRATIONS_TABLE = "schema_migrations"
+
+def add_column(conn, table: str, column: str, definition: str):
+    if column in {c["name"] for c in inspect(conn).get_columns(table)}:
+        print(f"  '{column}' column already exists in '{table}' table.")
+        return
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+    print(f"  Added '{column}' column to '{table}' table.")
+
+def create_index(conn, name: str, table: str, columns: str, unique: bool = False):
+    # Same names as the Index/index=True declarations in models.py, which create_all uses on new databases
+    conn.execute(text(f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+    print(f"  Index {name} on {table} ({columns}).")
+
+def drop_index(conn, name: str):
+    conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    print(f"  Dropped index {name}.")
+
+def add_task_position(conn):
+    add_column(conn, "tasks", "position", "INTEGER DEFAULT 0")
+
+def add_profile_stage_versions(conn):
+    add_column(conn, "profiles", "stage_version", "INTEGER DEFAULT 1")
+    # Existing profiles re-sync once on their next stage check
+    add_column(conn, "profiles", "tasks_synced_version", "INTEGER DEFAULT 0")
+
+def add_university_normalized_name(conn):
+    """Adds and backfills universities.normalized_name. Later duplicates of a name are left NULL."""
+    add_column(conn, "universities", "normalized_name", "VARCHAR")
+    taken = {row[0] for row in conn.execute(text("SELECT normalized_name FROM universities WHERE normalized_name IS NOT NULL"))}
+    updates = []
+    for uni_id, name in conn.execute(text("SELECT id, name FROM universities WHERE normalized_name IS NULL ORDER BY id")):
+        key = normalize_text(name)
+        if key and key not in taken:
+            taken.add(key)
+            updates.append({"id": uni_id, "key": key})
+    if updates:
+        conn.execute(text("UPDATE universities SET normalized_name = :key WHERE id = :id"), updates)
+    print(f"  Backfilled normalized_name for {len(updates)} universities.")
+    create_index(conn, "ix_universities_normalized_name", "universities", "normalized_name", unique=True)
+
+def add_user_indexes(conn):
+    create_index(conn, "ix_profiles_user_id", "profiles", "user_id")
+    create_index(conn, "ix_tasks_user_id", "tasks", "user_id")
+    create_index(conn, "ix_chat_messages_user_id_created_at", "chat_messages", "user_id, created_at")
+    create_index(conn, "ix_shortlist_user_id_is_locked", "shortlist", "user_id, is_locked")
+    create_index(conn, "ix_interviews_user_id_created_at", "interviews", "user_id, created_at")
+
+def dedupe_shortlist(conn):
+    """Keeps one shortlist row per (user, university), preferring a locked one, then the oldest."""
+    keep = {}
+    drop = []
+    rows = conn.execute(text("SELECT id, user_id, university_id, is_locked FROM shortlist ORDER BY id"))
+    for row_id, user_id, university_id, is_locked in rows:
+        key = (user_id, university_id)
+        kept = keep.get(key)
+        if kept is None:
+            keep[key] = (row_id, bool(is_locked))
+        elif is_locked and not kept[1]:
+            drop.append(kept[0])
+            keep[key] = (row_id, True)
+        else:
+            drop.append(row_id)
+    if drop:
+        conn.execute(text("DELETE FROM shortlist WHERE id = :id"), [{"id": row_id} for row_id in drop])
+    print(f"  Removed {len(drop)} duplicate shortlist rows.")
+    create_index(conn, "uq_shortlist_user_id_university_id", "shortlist", "user_id, university_id", unique=True)
+
+def add_chat_history_keyset_index(conn):
+    create_index(conn, "ix_chat_messages_user_id_created_at_id", "chat_messages", "user_id, created_at, id")
+    # A prefix of the new index
+    drop_index(conn, "ix_chat_messages_user_id_created_at")
+
+def add_interview_sessions(conn):
+    # interview_turns itself is created from the models; rows saved before sessions are complete transcripts
+    add_column(conn, "interviews", "status", "VARCHAR DEFAULT 'completed'")
+    add_column(conn, "interviews", "system_prompt", "TEXT")
+
+def add_interview_previews(conn):
+    add_column(conn, "interviews", "preview", "VARCHAR")
+    # Same rule as transcript_preview() in services/interview_service.py (200 characters)
+    result = conn.execute(text(
+        "UPDATE interviews SET preview = CASE WHEN length(transcript) > 200 "
+        "THEN substr(transcript, 1, 200) || '...' ELSE transcript END "
+        "WHERE preview IS NULL AND transcript IS NOT NULL"
+    ))
+    print(f"  Backfilled {result.rowcount} interview previews.")
+    create_index(conn, "ix_interviews_user_id_type_created_at_id", "interviews", "user_id, interview_type, created_at, id")
+    # A prefix (user_id) of the new index serves what it did
+    drop_index(conn, "ix_interviews_user_id_created_at")
+
+# Columns declared CompressedText in models.py
+COMPRESSED_COLUMNS = [
+    ("chat_messages", "text"),
+    ("interviews", "transcript"),
+    ("interviews", "system_prompt"),
+    ("interview_turns", "text"),
+]
+COMPRESS_BATCH_ROWS = 500
+
+def compress_column(conn, table: str, column: str):
+    """Compresses the column's existing values in batches by id, committing each batch."""
+    update = text(f"UPDATE {table} SET {column} = :value WHERE id = :id").bindparams(bindparam("value", type_=LargeBinary))
+    last_id = 0
+    rows_seen = compressed = input_bytes = stored_bytes = 0
+    while True:
+        rows = conn.execute(
+            text(f"SELECT id, {column} FROM {table} WHERE id > :last_id AND {column} IS NOT NULL ORDER BY id LIMIT :limit"),
+            {"last_id": last_id, "limit": COMPRESS_BATCH_ROWS},
+        ).all()
+        if not rows:
+            break
+        updates = []
+        for row_id, value in rows:
+            stored = value.encode("utf-8") if isinstance(value, str) else bytes(value)
+            if is_compressed(stored):
+                try:
+                    input_bytes += len(decompress_text(stored).encode("utf-8"))
+                    stored_bytes += len(stored)
+                    continue
+                except Exception:
+                    pass  # Text typed with the header's first bytes, saved before compress_text escaped it
+            input_bytes += len(stored)
+            stored = compress_text(stored.decode("utf-8"))
+            # Values that don't shrink stay as they are (unless they need the escape header)
+            if is_compressed(stored):
+                updates.append({"id": row_id, "value": stored})
+            stored_bytes += len(stored)
+        if updates:
+            conn.execute(update, updates)
+        # Already compressed values are skipped, so a rerun after a failure picks up where this stopped
+        conn.commit()
+        rows_seen += len(rows)
+        compressed += len(updates)
+        last_id = rows[-1][0]
+    ratio = f"{stored_bytes / input_bytes:.2f}" if input_bytes else "n/a"
+    print(f"  {table}.{column}: compressed {compressed} of {rows_seen} values, size ratio {ratio}.")
+
+def compress_long_text(conn):
+    for table, column in COMPRESSED_COLUMNS:
+        if conn.dialect.name == "postgresql":
+            column_type = {c["name"]: c["type"] for c in inspect(conn).get_columns(table)}[column]
+            if not isinstance(column_type, LargeBinary):
+                conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE BYTEA USING convert_to({column}, 'UTF8')"))
+                print(f"  {table}.{column} is now BYTEA.")
+        # SQLite stores the bytes in the existing TEXT column as is
+        compress_column(conn, table, column)
+
+def clear_placeholder_stats(conn):
+    # Shortlisting an unknown name used to create it with made-up stats (POST /universities/shortlist and the
+    # chat shortlist action); without them the recommendation catalog leaves these rows out
+    result = conn.execute(text(
+        "UPDATE universities SET acceptance_rate = NULL, tuition_fee = NULL "
+        "WHERE ranking IS NULL AND details IS NULL AND location IS NULL "
+        "AND ((acceptance_rate = 0.05 AND tuition_fee = '50000') OR (acceptance_rate = 0 AND tuition_fee = 'Unknown'))"
+    ))
+    print(f"  Cleared made-up stats of {result.rowcount} placeholder universities.")
+
+# (revision, description, step). Append new revisions at the end; never edit or reorder applied ones.
+MIGRATIONS = [
+    ("0001", "tasks.position", add_task_position),
+    ("0002", "profiles stage versions", add_profile_stage_versions),
+    ("0003", "universities.normalized_name", add_university_normalized_name),
+    ("0004", "indexes on user_id foreign keys", add_user_indexes),
+    ("0005", "unique (user_id, university_id) on shortlist", dedupe_shortlist),
+    ("0006", "chat_messages (user_id, created_at, id) for keyset pagination", add_chat_history_keyset_index),
+    ("0007", "server-side interview sessions", add_interview_sessions),
+    ("0008", "interview history previews and keyset index", add_interview_previews),
+    ("0009", "compressed chat and interview text", compress_long_text),
+    ("0010", "no made-up stats on placeholder universities", clear_placeholder_stats),
+]
+
+def applied_revisions(conn) -> set:
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} ("
+        "revision VARCHAR(32) PRIMARY KEY, description VARCHAR(255), applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+    ))
+    conn.commit()
+    return {row[0] for row in conn.execute(text(f"SELECT revision FROM {MIGRATIONS_TABLE}"))}
 
 def migrate():
-    print("Running manual migrations...")
+    print("Running migrations...")
+    # New tables (and every index of a brand new database) come from the models;
+    # the revisions bring databases created by older versions up to date
+    fresh = not inspect(engine).has_table("users")
+    Base.metadata.create_all(bind=engine)
+
     with engine.connect() as conn:
-        # Add position to tasks if not exists
-        try:
-            conn.execute(text("ALTER TABLE tasks ADD COLUMN position INTEGER DEFAULT 0;"))
+        applied = applied_revisions(conn)
+        if fresh:
+            # Already at the latest schema; older revisions may not even apply to it (e.g. 0008 on BYTEA columns)
+            conn.execute(
+                text(f"INSERT INTO {MIGRATIONS_TABLE} (revision, description) VALUES (:revision, :description)"),
+                [{"revision": revision, "description": description} for revision, description, _ in MIGRATIONS if revision not in applied],
+            )
             conn.commit()
-            print("- Added 'position' column to 'tasks' table.")
-        except Exception as e:
-            if "already exists" in str(e):
-                print("- 'position' column already exists in 'tasks' table.")
-            else:
-                print(f"- Warning adding 'position' to 'tasks': {e}")
-
-        # Sync all tables
-        Base.metadata.create_all(bind=engine)
-        print("- Syncing all tables (create_all)...")
-        
+            applied = {revision for revision, _, _ in MIGRATIONS}
+            print("- New database, all revisions marked as applied.")
+        pending = [m for m in MIGRATIONS if m[0] not in applied]
+        for revision, description, step in pending:
+            print(f"- {revision}: {description}")
+            try:
+                step(conn)
+                conn.execute(
+                    text(f"INSERT INTO {MIGRATIONS_TABLE} (revision, description) VALUES (:revision, :description)"),
+                    {"revision": revision, "description": description},
+                )
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"- {revision} failed, stopping: {e}")
+                sys.exit(1)
+        if not pending:
+            print("- Nothing to apply.")
+
     print("Migration complete.")
 
+def status():
+    with engine.connect() as conn:
+        applied = applied_revisions(conn)
+    for revision, description, _ in MIGRATIONS:
+        print(f"{'applied' if revision in applied else 'pending':8} {revision} {description}")
+
 if __name__ == "__main__":
-    migrate()
+    if len(sys.argv) > 1 and sys.argv[1] == "status":
+        status()
+    else:
+        migrate()
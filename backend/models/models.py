@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Boolean, DateTime, JSON, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Boolean, DateTime, JSON, Text, Index, event
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql import func
 from .database import Base
+from .types import CompressedText
+from utils.text import normalize_text
 
 class User(Base):
     __tablename__ = "users"
@@ -19,21 +21,43 @@ class User(Base):
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        # History is read per user, newest first, paged by (created_at, id); also covers user_id lookups
+        Index("ix_chat_messages_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     role = Column(String)  # user or bot
-    text = Column(Text)
+    text = Column(CompressedText)
     is_action = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     user = relationship("User", back_populates="messages")
 
+class ArchivedChatMessage(Base):
+    """
+    Cold store of chat messages moved out of chat_messages (services/chat_archive.py), with their
+    original ids. Only the history endpoint reads it, once it pages past a user's hot messages.
+    """
+    __tablename__ = "chat_messages_archive"
+    __table_args__ = (
+        Index("ix_chat_messages_archive_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=False) # Same id as in chat_messages
+    user_id = Column(Integer, ForeignKey("users.id"))
+    role = Column(String)
+    text = Column(CompressedText)
+    is_action = Column(Boolean, default=False)
+    created_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
 class Profile(Base):
     __tablename__ = "profiles"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     
     # Personal Info
     full_name = Column(String)
@@ -59,17 +83,26 @@ class Profile(Base):
     # System State
     onboarding_completed = Column(Boolean, default=False)
     current_stage = Column(String, default="Building Profile") # Discovery, Shortlisting, Applications
+    stage_version = Column(Integer, default=1) # Bumped whenever current_stage changes
+    tasks_synced_version = Column(Integer, default=0) # stage_version the stage tasks were last synced for
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     user = relationship("User", back_populates="profile")
 
+@event.listens_for(Profile.current_stage, "set", active_history=True)
+def bump_stage_version(target, value, oldvalue, initiator):
+    # Lets the task engine tell a real stage change apart from a re-save of the same stage
+    if value != oldvalue:
+        target.stage_version = (target.stage_version or 1) + 1
+
 class University(Base):
     __tablename__ = "universities"
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
+    normalized_name = Column(String, unique=True, index=True) # Upsert key, kept in sync with name
     country = Column(String, index=True)
     location = Column(String)
     
@@ -77,12 +110,22 @@ class University(Base):
     acceptance_rate = Column(Float)
     ranking = Column(Integer, nullable=True)
     
-    details = Column(JSON) # Extra data from API
+    details = Column(JSON(none_as_null=True)) # Extra data from API; None is stored as SQL NULL
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    @validates("name")
+    def sync_normalized_name(self, key, value):
+        self.normalized_name = normalize_text(value) or None
+        return value
+
 class Shortlist(Base):
     __tablename__ = "shortlist"
+    __table_args__ = (
+        # A university is on a user's shortlist at most once; also covers user_id lookups
+        Index("uq_shortlist_user_id_university_id", "user_id", "university_id", unique=True),
+        Index("ix_shortlist_user_id_is_locked", "user_id", "is_locked"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -101,7 +144,7 @@ class Task(Base):
     __tablename__ = "tasks"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     
     title = Column(String)
     description = Column(String, nullable=True)
@@ -115,14 +158,48 @@ class Task(Base):
 
 class Interview(Base):
     __tablename__ = "interviews"
+    __table_args__ = (
+        # History is listed per user and mode, newest first, paged by (created_at, id)
+        Index("ix_interviews_user_id_type_created_at_id", "user_id", "interview_type", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     university_id = Column(Integer, ForeignKey("universities.id"), nullable=True) # If null, it's a generic or Visa interview
     
     interview_type = Column(String) # "university" or "visa"
-    transcript = Column(Text)
+    transcript = Column(CompressedText) # Assembled from the turns when the session ends
+    preview = Column(String, nullable=True) # Start of the transcript, so history lists never read the transcript
+    status = Column(String, default="completed") # "active" while the session is running
+    system_prompt = Column(CompressedText, nullable=True) # Interviewer persona, resolved once when the session starts
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     user = relationship("User", back_populates="interviews")
     university = relationship("University")
+    turns = relationship("InterviewTurn", back_populates="interview", order_by="InterviewTurn.id")
+
+class InterviewTurn(Base):
+    __tablename__ = "interview_turns"
+    __table_args__ = (
+        # Turns are read per interview in order, the latest few for the LLM context
+        Index("ix_interview_turns_interview_id_id", "interview_id", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    interview_id = Column(Integer, ForeignKey("interviews.id"))
+    role = Column(String) # "user" or "model"
+    text = Column(CompressedText)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    interview = relationship("Interview", back_populates="turns")
+
+class ConversationSummary(Base):
+    __tablename__ = "conversation_summaries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, index=True)
+    
+    summary = Column(Text, default="")
+    last_message_id = Column(Integer, default=0) # Newest ChatMessage already folded into the summary
+    
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,17 @@
+from sqlalchemy import LargeBinary
+from sqlalchemy.types import TypeDecorator
+from utils.compression import compress_text, decompress_text
+
+class CompressedText(TypeDecorator):
+    """
+    Text column stored compressed (utils/compression.py). Reads and writes plain str, so queries
+    and handlers don't change; the column can't be filtered or searched in SQL.
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return compress_text(value) if value is not None else None
+
+    def process_result_value(self, value, dialect):
+        return decompress_text(value) if value is not None else None
@@ -1,21 +1,128 @@
 from google import genai
-from groq import Groq
+from google.genai import types
+from groq import Groq, AsyncGroq
+from dotenv import load_dotenv
+from .provider_router import LLMProvider, ProviderRouter, ProviderError
+from .llm_cache import SQLiteCacheBackend, ResponseCache, make_cache_key
+from utils.cache import LRUTTLCache
+import httpx
+import threading
 import os
 import json
 import re
 
+load_dotenv()
+
+# Connection pool settings shared by every provider client of this worker
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "1"))
+
+# Provider routing: per-call timeout, circuit breaker and optional hedging (unset = no hedging)
+LLM_PROVIDER_TIMEOUT_SECONDS = float(os.getenv("LLM_PROVIDER_TIMEOUT_SECONDS", "20"))
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "3"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+LLM_HEDGE_AFTER_MS = os.getenv("LLM_HEDGE_AFTER_MS")
+
+# Response cache for counsellor prompts. LLM_CACHE_PATH adds a SQLite file so entries survive restarts.
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH")
+
+# Clients are created once per worker process and reused by the chat and interview
+# routers, so a turn rides an already open keep-alive connection instead of a new TLS handshake.
+_clients = {}
+_clients_lock = threading.Lock()
+
+def _http_limits():
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY_SECONDS,
+    )
+
+def _http_timeout():
+    return httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS)
+
+def _shared_client(name: str, factory):
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = factory()
+                if client is not None:
+                    _clients[name] = client
+    return client
+
 # Configure APIs
-def get_gemini_client():
+def _create_gemini_client():
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
         return None
-    return genai.Client(api_key=api_key)
+    # One genai client serves both the sync and the .aio interfaces
+    return genai.Client(
+        api_key=api_key,
+        http_options=types.HttpOptions(
+            timeout=int(LLM_TIMEOUT_SECONDS * 1000),
+            client_args={"limits": _http_limits()},
+            async_client_args={"limits": _http_limits()},
+        ),
+    )
 
-def get_groq_client():
+def _create_groq_client():
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        return None
+    return Groq(
+        api_key=api_key,
+        max_retries=LLM_MAX_RETRIES,
+        http_client=httpx.Client(limits=_http_limits(), timeout=_http_timeout()),
+    )
+
+def _create_async_groq_client():
     api_key = os.getenv("GROQ_API_KEY")
     if not api_key:
         return None
-    return Groq(api_key=api_key)
+    return AsyncGroq(
+        api_key=api_key,
+        max_retries=LLM_MAX_RETRIES,
+        http_client=httpx.AsyncClient(limits=_http_limits(), timeout=_http_timeout()),
+    )
+
+def get_gemini_client():
+    return _shared_client("gemini", _create_gemini_client)
+
+def get_groq_client():
+    return _shared_client("groq", _create_groq_client)
+
+def get_async_groq_client():
+    return _shared_client("groq_async", _create_async_groq_client)
+
+async def close_clients():
+    """Closes the pooled provider connections, called on app shutdown."""
+    with _clients_lock:
+        clients = dict(_clients)
+        _clients.clear()
+
+    for name, client in clients.items():
+        try:
+            if name == "groq_async":
+                await client.close()
+            elif name == "groq":
+                client.close()
+            elif name == "gemini":
+                await client.aio.aclose()
+                client.close()
+        except Exception as e:
+            print(f"Error closing {name} client: {e}")
+
+    if _response_cache is not None and _response_cache.backend is not None:
+        _response_cache.backend.close()
 
 # Best available models
 GROQ_MODEL = "llama-3.3-70b-versatile"
@@ -52,52 +159,307 @@ COMMUNICATION GUIDELINES:
 - Keep responses professional, empathetic, and visually structured. Avoid long paragraphs.
 """
 
-def get_counsellor_response(context: str, user_input: str, history: list = None) -> str:
-    # Construct base prompt
-    full_context = f"{SYSTEM_PROMPT}\n\n[USER CONTEXT - FOR YOUR INTERNAL KNOWLEDGE ONLY, DO NOT MENTION THIS TAG]:\n{context}\n\n[FINAL INSTRUCTION]:\nSpeak directly to the student. Do not acknowledge that you were given a 'context' block. Just use the information to be helpful. If the student has already locked a university, focus on the next steps for that specific university."
-    
-    # Try Groq first
+def build_counsellor_context(context: str) -> str:
+    return f"{SYSTEM_PROMPT}\n\n[USER CONTEXT - FOR YOUR INTERNAL KNOWLEDGE ONLY, DO NOT MENTION THIS TAG]:\n{context}\n\n[FINAL INSTRUCTION]:\nSpeak directly to the student. Do not acknowledge that you were given a 'context' block. Just use the information to be helpful. If the student has already locked a university, focus on the next steps for that specific university."
+
+def build_groq_messages(system_prompt: str, user_input: str, history: list = None) -> list:
+    messages = [{"role": "system", "content": system_prompt}]
+
+    # Add history if available
+    if history:
+        for msg in history:
+            messages.append({"role": msg["role"], "content": msg["text"]})
+
+    # Add current user input
+    messages.append({"role": "user", "content": user_input})
+    return messages
+
+def build_gemini_prompt(system_prompt: str, user_input: str, history: list = None) -> str:
+    # Gemini client handles history as a list of dicts with role/parts
+    # We'll just pass the whole thing as a single prompt for simplicity in this fallback
+    history_str = ""
+    if history:
+        for msg in history:
+            history_str += f"{msg['role'].upper()}: {msg['text']}\n"
+
+    return f"{system_prompt}\n\n[CHAT HISTORY]\n{history_str}\n\nUSER: {user_input}"
+
+class GroqProvider(LLMProvider):
+    name = "groq"
+
+    def is_configured(self) -> bool:
+        return get_async_groq_client() is not None
+
+    async def complete(self, system_prompt: str, user_input: str, history: list = None, temperature: float = None) -> str:
+        options = {} if temperature is None else {"temperature": temperature}
+        chat_completion = await get_async_groq_client().chat.completions.create(
+            messages=build_groq_messages(system_prompt, user_input, history),
+            model=GROQ_MODEL,
+            **options
+        )
+        return chat_completion.choices[0].message.content
+
+    async def stream(self, system_prompt: str, user_input: str, history: list = None, temperature: float = None):
+        options = {} if temperature is None else {"temperature": temperature}
+        stream = await get_async_groq_client().chat.completions.create(
+            messages=build_groq_messages(system_prompt, user_input, history),
+            model=GROQ_MODEL,
+            stream=True,
+            **options
+        )
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def is_configured(self) -> bool:
+        return get_gemini_client() is not None
+
+    def _config(self, temperature: float = None):
+        return None if temperature is None else types.GenerateContentConfig(temperature=temperature)
+
+    async def complete(self, system_prompt: str, user_input: str, history: list = None, temperature: float = None) -> str:
+        response = await get_gemini_client().aio.models.generate_content(
+            model=GEMINI_MODEL,
+            contents=build_gemini_prompt(system_prompt, user_input, history),
+            config=self._config(temperature)
+        )
+        return response.text
+
+    async def stream(self, system_prompt: str, user_input: str, history: list = None, temperature: float = None):
+        stream = await get_gemini_client().aio.models.generate_content_stream(
+            model=GEMINI_MODEL,
+            contents=build_gemini_prompt(system_prompt, user_input, history),
+            config=self._config(temperature)
+        )
+        async for chunk in stream:
+            if chunk.text:
+                yield chunk.text
+
+_router = None
+
+def get_provider_router() -> ProviderRouter:
+    # Groq first for speed, Gemini as the fallback. Breaker state lives as long as the worker.
+    global _router
+    if _router is None:
+        _router = ProviderRouter(
+            [GroqProvider(), GeminiProvider()],
+            hedge_after=int(LLM_HEDGE_AFTER_MS) / 1000 if LLM_HEDGE_AFTER_MS else None,
+            provider_timeout=LLM_PROVIDER_TIMEOUT_SECONDS,
+            failure_threshold=LLM_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=LLM_BREAKER_RESET_SECONDS,
+        )
+    return _router
+
+_background_router = None
+
+def get_background_router() -> ProviderRouter:
+    """
+    Same providers (and pooled clients) for background work such as summaries, with breakers of its
+    own: a long or failing background prompt must not open the breakers chat traffic goes through.
+    """
+    global _background_router
+    if _background_router is None:
+        _background_router = ProviderRouter(
+            get_provider_router().providers,
+            provider_timeout=LLM_PROVIDER_TIMEOUT_SECONDS,
+            failure_threshold=LLM_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=LLM_BREAKER_RESET_SECONDS,
+        )
+    return _background_router
+
+_response_cache = None
+
+def get_response_cache():
+    global _response_cache
+    if _response_cache is None and LLM_CACHE_ENABLED:
+        backend = SQLiteCacheBackend(LLM_CACHE_PATH, ttl=LLM_CACHE_TTL_SECONDS) if LLM_CACHE_PATH else None
+        _response_cache = ResponseCache(LRUTTLCache(LLM_CACHE_MAX_ENTRIES, ttl=LLM_CACHE_TTL_SECONDS), backend)
+    return _response_cache
+
+def counsellor_cache_key(context: str, user_input: str, history: list = None) -> str:
+    # The models are part of the key so switching them doesn't serve answers from the old ones
+    return make_cache_key("counsellor", GROQ_MODEL, GEMINI_MODEL, SYSTEM_PROMPT, context, history or [], user_input)
+
+async def get_counsellor_response(context: str, user_input: str, history: list = None, use_cache: bool = True) -> str:
+    """
+    Async counsellor completion through the provider router, so a slow or failing
+    provider only suspends this request and known-bad providers are skipped.
+    Identical prompts are answered from the response cache unless use_cache is False.
+    """
+    cache = get_response_cache() if use_cache else None
+    if cache is not None:
+        key = counsellor_cache_key(context, user_input, history)
+        cached = await cache.get(key)
+        if cached is not None:
+            return cached
+
+    try:
+        response = await get_provider_router().complete(build_counsellor_context(context), user_input, history=history)
+    except ProviderError as e:
+        return f"I'm sorry, I'm having trouble connecting to my reasoning core right now. ({str(e.__cause__ or e)})"
+
+    if cache is not None and response:
+        await cache.set(key, response)
+    return response
+
+async def stream_counsellor_response(context: str, user_input: str, history: list = None, use_cache: bool = True):
+    """
+    Async generator yielding the counsellor reply as text deltas while the provider generates it.
+    A cached reply is sent as a single delta; only complete streams are stored.
+    """
+    cache = get_response_cache() if use_cache else None
+    if cache is not None:
+        key = counsellor_cache_key(context, user_input, history)
+        cached = await cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    chunks = []
+    try:
+        async for delta in get_provider_router().stream(build_counsellor_context(context), user_input, history=history):
+            chunks.append(delta)
+            yield delta
+    except ProviderError as e:
+        if not chunks:
+            yield f"I'm sorry, I'm having trouble connecting to my reasoning core right now. ({str(e.__cause__ or e)})"
+        return
+
+    if cache is not None and chunks:
+        await cache.set(key, "".join(chunks))
+
+INTERVIEW_FALLBACK_REPLY = "I apologize, could you repeat that?"
+
+async def get_interview_response(system_prompt: str, user_input: str, history: list = None) -> str:
+    # Interviews are never cached: every turn should feel live, and the slight variance keeps the officer from sounding scripted
     try:
-        client = get_groq_client()
-        if client:
-            messages = [{"role": "system", "content": full_context}]
-            
-            # Add history if available
-            if history:
-                for msg in history:
-                    messages.append({"role": msg["role"], "content": msg["text"]})
-            
-            # Add current user input
-            messages.append({"role": "user", "content": user_input})
-            
-            chat_completion = client.chat.completions.create(
-                messages=messages,
-                model=GROQ_MODEL,
-            )
-            return chat_completion.choices[0].message.content
-    except Exception as e:
-        print(f"Groq Error/Rate Limit: {e}. Falling back to Gemini...")
-
-    # Fallback to Gemini
+        return await get_provider_router().complete(system_prompt, user_input, history=history, temperature=0.7)
+    except ProviderError:
+        return INTERVIEW_FALLBACK_REPLY
+
+async def stream_interview_response(system_prompt: str, user_input: str, history: list = None):
+    """Async generator variant of get_interview_response, yielding text deltas."""
+    started = False
+    try:
+        async for delta in get_provider_router().stream(system_prompt, user_input, history=history, temperature=0.7):
+            started = True
+            yield delta
+    except ProviderError:
+        if not started:
+            yield INTERVIEW_FALLBACK_REPLY
+
+SUMMARY_PROMPT = """
+You maintain a running summary of a conversation between a student and their study abroad counsellor.
+Merge the new messages into the existing summary. Keep decisions, universities discussed, deadlines,
+concerns and open questions. Drop greetings and small talk. Write at most 150 words of plain text.
+"""
+
+async def summarize_conversation(previous_summary: str, messages: list):
+    """
+    Folds `messages` ([{"role", "text"}], oldest first) into the rolling summary.
+    Returns None when no provider could answer so the caller keeps the old summary.
+    """
+    transcript = "\n".join(f"{m['role'].upper()}: {m['text']}" for m in messages)
+    user_input = f"[EXISTING SUMMARY]\n{previous_summary or 'None yet.'}\n\n[NEW MESSAGES]\n{transcript}"
     try:
-        client = get_gemini_client()
-        if client:
-            # Gemini client handles history as a list of dicts with role/parts
-            # We'll just pass the whole thing as a single prompt for simplicity in this fallback
-            history_str = ""
-            if history:
-                for msg in history:
-                    history_str += f"{msg['role'].upper()}: {msg['text']}\n"
-            
-            final_prompt = f"{full_context}\n\n[CHAT HISTORY]\n{history_str}\n\nUSER: {user_input}"
-            
-            response = client.models.generate_content(
-                model=GEMINI_MODEL,
-                contents=final_prompt
-            )
-            return response.text
-    except Exception as e:
-        return f"I'm sorry, I'm having trouble connecting to my reasoning core right now. ({str(e)})"
+        summary = await get_background_router().complete(SUMMARY_PROMPT, user_input, temperature=0.2)
+    except ProviderError as e:
+        print(f"Summary Error: {e.__cause__ or e}")
+        return None
+    return summary.strip() if summary else None
+
+class ActionStreamFilter:
+    """
+    Hides [ACTION: {...}] tags from a token stream as it arrives.
+    Text that might be the start of a tag is held back until it can be decided.
+    """
+    TAG = "[ACTION:"
+
+    def __init__(self):
+        self.buffer = ""
+
+    def feed(self, delta: str) -> str:
+        self.buffer += delta
+        visible = []
+        while True:
+            start = self.buffer.find(self.TAG)
+            if start == -1:
+                keep = self._partial_tag_length()
+                visible.append(self.buffer[:len(self.buffer) - keep])
+                self.buffer = self.buffer[len(self.buffer) - keep:]
+                break
+
+            visible.append(self.buffer[:start])
+            end = self.buffer.find("]", start)
+            if end == -1:
+                # Tag still being generated, wait for its closing bracket
+                self.buffer = self.buffer[start:]
+                break
+            self.buffer = self.buffer[end + 1:]
+        return "".join(visible)
+
+    def flush(self) -> str:
+        # Whatever is left never turned into a complete tag, so it is regular text (same as strip_actions)
+        rest = self.buffer
+        self.buffer = ""
+        return rest
+
+    def _partial_tag_length(self) -> int:
+        for size in range(min(len(self.TAG) - 1, len(self.buffer)), 0, -1):
+            if self.buffer.endswith(self.TAG[:size]):
+                return size
+        return 0
+
+class SentenceChunker:
+    """
+    Regroups a token stream into whole sentences, so text-to-speech can start on the first one
+    while the rest is still being generated.
+    """
+    # End of sentence: . ! ? (plus closing quotes/brackets) followed by whitespace, or a line break
+    BOUNDARY = re.compile(r'[.!?]+["\')\]]*\s+|\n+')
+    # Words whose trailing period doesn't end a sentence
+    ABBREVIATIONS = {"mr", "mrs", "ms", "dr", "prof", "st", "vs", "etc", "e.g", "i.e", "u.s", "u.k"}
+    # Only abbreviations before a number: "No. 5" but "No. Who is sponsoring you?"
+    NUMBER_ABBREVIATIONS = {"no"}
+
+    def __init__(self):
+        self.buffer = ""
+
+    def feed(self, delta: str) -> list:
+        self.buffer += delta
+        sentences = []
+        start = 0
+        for match in self.BOUNDARY.finditer(self.buffer):
+            end = match.end()
+            candidate = self.buffer[start:end]
+            if match.group().rstrip().rstrip("\"')]") == ".":
+                word = self._last_word(self.buffer[start:match.start()])
+                if word in self.ABBREVIATIONS:
+                    continue
+                if word in self.NUMBER_ABBREVIATIONS:
+                    following = self.buffer[end:end + 1]
+                    if not following:
+                        break  # Decided by the next token
+                    if following.isdigit():
+                        continue
+            if candidate.strip():
+                sentences.append(candidate.strip())
+            start = end
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self) -> list:
+        rest = self.buffer.strip()
+        self.buffer = ""
+        return [rest] if rest else []
+
+    def _last_word(self, text: str) -> str:
+        words = text.split()
+        return words[-1].lower().rstrip(".") if words else ""
 
 def parse_actions(text: str):
     actions = []
@@ -109,3 +471,7 @@ def parse_actions(text: str):
         except:
             continue
     return actions
+
+def strip_actions(text: str) -> str:
+    # Clean up the [ACTION] tags before the text is shown or stored
+    return re.sub(r'\[ACTION:.*?\]', '', text, flags=re.DOTALL).strip()
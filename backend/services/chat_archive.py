@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, func, insert, or_, select
+from sqlalchemy.orm import Session
+from models import models
+import os
+
+# chat_messages keeps each user's recent messages; older ones move to chat_messages_archive.
+# A message is archived once it is older than the horizon or outside the user's newest N, and only
+# after the rolling summary has folded it in, so chat turns never need the archive.
+CHAT_HOT_MAX_AGE_DAYS = int(os.getenv("CHAT_HOT_MAX_AGE_DAYS", "90"))
+CHAT_HOT_MESSAGES_PER_USER = int(os.getenv("CHAT_HOT_MESSAGES_PER_USER", "200"))
+CHAT_ARCHIVE_BATCH_SIZE = int(os.getenv("CHAT_ARCHIVE_BATCH_SIZE", "1000"))
+
+ARCHIVED_COLUMNS = ("id", "user_id", "role", "text", "is_action", "created_at")
+
+def archivable_ids(user_id: int, watermark: int, cutoff: datetime, limit: int, db: Session) -> list:
+    message = models.ChatMessage
+    # Newest first per user; one user's rows, over ix_chat_messages_user_id_created_at_id
+    rank = func.row_number().over(order_by=(message.created_at.desc(), message.id.desc())).label("rank")
+    ranked = select(message.id, message.created_at, rank).where(message.user_id == user_id).subquery()
+    return list(db.scalars(
+        select(ranked.c.id)
+        .where(ranked.c.id <= watermark, or_(ranked.c.created_at < cutoff, ranked.c.rank > CHAT_HOT_MESSAGES_PER_USER))
+        .order_by(ranked.c.id)
+        .limit(limit)
+    ))
+
+def move_to_archive(ids: list, db: Session):
+    """Copies the rows to the archive and deletes them from chat_messages, in one transaction."""
+    message = models.ChatMessage
+    # Copied in SQL: the stored (compressed) text is moved as is
+    db.execute(insert(models.ArchivedChatMessage).from_select(
+        ARCHIVED_COLUMNS, select(*(getattr(message, c) for c in ARCHIVED_COLUMNS)).where(message.id.in_(ids))
+    ))
+    db.execute(delete(message).where(message.id.in_(ids)))
+    db.commit()
+
+def archive_chat_messages(db: Session, batch_size: int = CHAT_ARCHIVE_BATCH_SIZE) -> int:
+    """Moves every archivable message, user by user, batch_size rows per transaction. Returns the count."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=CHAT_HOT_MAX_AGE_DAYS)
+    summary = models.ConversationSummary
+    # Users without a summary have nothing folded yet, so nothing to archive
+    watermarks = db.execute(select(summary.user_id, summary.last_message_id).where(summary.last_message_id > 0)).all()
+    moved = 0
+    for user_id, watermark in watermarks:
+        while True:
+            ids = archivable_ids(user_id, watermark, cutoff, batch_size, db)
+            if not ids:
+                break
+            move_to_archive(ids, db)
+            moved += len(ids)
+    return moved
@@ -0,0 +1,209 @@
+from utils.text import normalize_text
+import math
+import mmap
+import os
+import struct
+from array import array
+import numpy as np
+
+# File layout (little-endian), every section starting on an 8 byte boundary:
+#   header | ids int64 | kinds uint8 | name, city, state, country, website uint32 string ids
+#   | tuition float64 | acceptance float64 | ranking int32 | string offsets uint64[n + 1] | string blob
+# String id 0 is "missing". Strings are interned, so a country or city is stored once however
+# many rows use it. Workers map the file read-only, so its pages are shared between processes.
+MAGIC = b"UNICAT\x00\x00"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sIIQQQ")  # magic, version, reserved, rows, strings, max_db_id
+STRING_COLUMNS = ("name", "city", "state", "country", "website")
+KIND_CATALOG, KIND_DB = 0, 1
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+def _number(value) -> float:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return math.nan
+    return number if math.isfinite(number) else math.nan
+
+def write_catalog(path: str, docs) -> int:
+    """
+    Writes docs (MOCK_DATA shaped dicts, ids like 12 or "db-12") to `path`. Later docs with an
+    already written name are skipped. The file is replaced atomically, so running workers keep
+    their current mapping until they restart.
+    """
+    strings = {"": 0}
+    blob = bytearray()
+    string_offsets = array("Q", [0, 0])  # string i is blob[offsets[i]:offsets[i + 1]]
+    columns = {name: array("I") for name in STRING_COLUMNS}
+    ids, kinds = array("q"), array("B")
+    tuition, acceptance, ranking = array("d"), array("d"), array("i")
+    names = set()
+    max_db_id = 0
+
+    def intern(value) -> int:
+        if value in (None, ""):
+            return 0
+        value = str(value)
+        sid = strings.get(value)
+        if sid is None:
+            sid = strings[value] = len(strings)
+            blob.extend(value.encode("utf-8"))
+            string_offsets.append(len(blob))
+        return sid
+
+    for doc in docs:
+        name = normalize_text(doc.get("school.name"))
+        if not name or name in names:
+            continue
+        names.add(name)
+
+        key = doc.get("id")
+        if isinstance(key, str) and key.startswith("db-"):
+            ids.append(int(key[3:]))
+            kinds.append(KIND_DB)
+            max_db_id = max(max_db_id, int(key[3:]))
+        else:
+            ids.append(int(key))
+            kinds.append(KIND_CATALOG)
+        for column, field in zip(STRING_COLUMNS, ("school.name", "school.city", "school.state", "school.country", "website")):
+            columns[column].append(intern(doc.get(field)))
+        tuition.append(_number(doc.get("latest.cost.tuition.out_of_state")))
+        acceptance.append(_number(doc.get("latest.admissions.admission_rate.overall")))
+        rank = _number(doc.get("ranking"))
+        ranking.append(int(rank) if rank > 0 else 0)
+
+    sections = [ids, kinds] + [columns[c] for c in STRING_COLUMNS] + [tuition, acceptance, ranking, string_offsets, blob]
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(ids), len(strings), max_db_id))
+        for section in sections:
+            f.write(b"\x00" * (_align(f.tell()) - f.tell()))
+            f.write(section if isinstance(section, bytearray) else section.tobytes())
+    os.replace(tmp_path, path)
+    return len(ids)
+
+class CompactCatalog:
+    """
+    Read-only view of a catalog file. Numeric columns are NumPy arrays over the mapping
+    (no copy); strings are decoded from the shared string table when a row asks for them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, rows, strings, self.max_db_id = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} university catalog")
+        self._offset = HEADER.size
+
+        self.ids = self._take("<i8", rows)
+        self.kinds = self._take("u1", rows)
+        for column in STRING_COLUMNS:
+            setattr(self, f"{column}_sid", self._take("<u4", rows))
+        self.tuition = self._take("<f8", rows)
+        self.acceptance = self._take("<f8", rows)
+        self.ranking = self._take("<i4", rows)
+        self.string_offsets = self._take("<u8", strings + 1)
+        self._blob_offset = _align(self._offset)
+
+    def _take(self, dtype: str, count: int) -> np.ndarray:
+        self._offset = _align(self._offset)
+        column = np.frombuffer(self._mmap, dtype=dtype, count=count, offset=self._offset)
+        self._offset += column.nbytes
+        return column
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return (CatalogRow(self, index) for index in range(len(self.ids)))
+
+    def string(self, sid: int):
+        if not sid:
+            return None
+        start = self._blob_offset + int(self.string_offsets[sid])
+        end = self._blob_offset + int(self.string_offsets[sid + 1])
+        return self._mmap[start:end].decode("utf-8")
+
+class CatalogRow:
+    """
+    Record access to one catalog row. Duck-types as a result dict for reads (`get`, `[]`);
+    call to_doc() for a real dict, e.g. before returning it from an API.
+    """
+    __slots__ = ("catalog", "index")
+
+    def __init__(self, catalog: CompactCatalog, index: int):
+        self.catalog = catalog
+        self.index = index
+
+    @property
+    def key(self):
+        row_id = int(self.catalog.ids[self.index])
+        return f"db-{row_id}" if self.catalog.kinds[self.index] == KIND_DB else row_id
+
+    @property
+    def name(self):
+        return self.catalog.string(self.catalog.name_sid[self.index])
+
+    @property
+    def city(self):
+        return self.catalog.string(self.catalog.city_sid[self.index])
+
+    @property
+    def state(self):
+        return self.catalog.string(self.catalog.state_sid[self.index])
+
+    @property
+    def country(self):
+        return self.catalog.string(self.catalog.country_sid[self.index])
+
+    @property
+    def website(self):
+        return self.catalog.string(self.catalog.website_sid[self.index])
+
+    @property
+    def tuition(self):
+        value = float(self.catalog.tuition[self.index])
+        if math.isnan(value):
+            return "N/A"
+        return int(value) if value.is_integer() else value
+
+    @property
+    def acceptance_rate(self) -> float:
+        value = float(self.catalog.acceptance[self.index])
+        return 0.0 if math.isnan(value) else value
+
+    @property
+    def ranking(self):
+        return int(self.catalog.ranking[self.index]) or None
+
+    def get(self, field: str, default=None):
+        getter = DOC_FIELDS.get(field)
+        value = getter(self) if getter else None
+        return default if value is None else value
+
+    def __getitem__(self, field: str):
+        return DOC_FIELDS[field](self)
+
+    def to_doc(self) -> dict:
+        return {field: getter(self) for field, getter in DOC_FIELDS.items()}
+
+# Result dict keys (see university_to_doc) -> row accessors
+DOC_FIELDS = {
+    "id": lambda row: row.key,
+    "school.name": lambda row: row.name,
+    "school.city": lambda row: row.city or "",
+    "school.state": lambda row: row.state or "",
+    "school.country": lambda row: row.country or "",
+    "latest.cost.tuition.out_of_state": lambda row: row.tuition,
+    "latest.admissions.admission_rate.overall": lambda row: row.acceptance_rate,
+    "website": lambda row: row.website,
+    "ranking": lambda row: row.ranking,
+}
+
+def as_doc(doc) -> dict:
+    """Result dicts pass through; catalog rows are turned into one."""
+    return doc.to_doc() if isinstance(doc, CatalogRow) else doc
@@ -0,0 +1,125 @@
+import os
+import json
+
+# Prompt budget for a counsellor turn: system prompt, context blocks, history and the new message together
+CHAT_PROMPT_TOKEN_BUDGET = int(os.getenv("CHAT_PROMPT_TOKEN_BUDGET", "3000"))
+
+# Role/formatting tokens every chat message costs on top of its text
+MESSAGE_OVERHEAD_TOKENS = 4
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximate token count (~4 characters per token for English with the Llama and Gemini tokenizers).
+    Close enough for budgeting without shipping a tokenizer per provider.
+    """
+    if not text:
+        return 0
+    return len(text) // 4 + 1
+
+class ContextSection:
+    """
+    One block of the prompt. Sections are filled by `priority` (lower first) until the budget
+    runs out, item by item, and rendered by `order` so the prompt layout stays stable.
+    """
+
+    def __init__(self, title: str, items: list, priority: int, order: int, is_history: bool = False):
+        self.title = title
+        self.items = items
+        self.priority = priority
+        self.order = order
+        self.is_history = is_history
+
+    def header_tokens(self) -> int:
+        return 0 if self.is_history else estimate_tokens(f"\n{self.title}:\n")
+
+    def item_tokens(self, item) -> int:
+        if self.is_history:
+            return estimate_tokens(item["text"]) + MESSAGE_OVERHEAD_TOKENS
+        return estimate_tokens(f"- {item}\n")
+
+    def render(self, items: list) -> str:
+        return f"{self.title}:\n- " + "\n- ".join(items) + "\n"
+
+class PromptContext:
+    def __init__(self, context: str, history: list, prompt_tokens: int):
+        self.context = context
+        self.history = history
+        self.prompt_tokens = prompt_tokens
+
+def render_student_sections(profile, shortlist: list, tasks: list) -> list:
+    """
+    Turns the student's state into prioritized sections. `shortlist` is a list of
+    {"name", "is_locked"} dicts.
+    """
+    sections = []
+    if profile:
+        sections.append(ContextSection("STUDENT PROFILE", [
+            f"Name: {profile.full_name}",
+            f"Current Education: {profile.current_education_level} in {profile.degree_major}",
+            f"Academic Performance: GPA {profile.gpa if profile.gpa else 'Not Provided'}",
+            f"Standardized Tests: {json.dumps(profile.exam_scores) if profile.exam_scores else 'None'}",
+            f"Target Goal: {profile.target_degree} in {profile.target_field} ({profile.target_intake_year})",
+            f"Preference: {', '.join(profile.preferred_countries) if profile.preferred_countries else 'Any'}",
+            f"Finance: Budget {profile.budget_range} ({profile.funding_plan})",
+            f"Current Milestone: {profile.current_stage}",
+        ], priority=1, order=1))
+
+    if shortlist:
+        # Locked universities first so they survive a tight budget
+        ordered = sorted(shortlist, key=lambda s: not s["is_locked"])
+        sections.append(ContextSection(
+            "DECISION PIPELINE",
+            [f"{s['name']} ({'LOCKED & FINALIZED' if s['is_locked'] else 'Shortlisted'})" for s in ordered],
+            priority=2, order=2,
+        ))
+
+    pending = [t for t in tasks if t.status != "Completed"]
+    completed = [t for t in tasks if t.status == "Completed"]
+    if pending:
+        sections.append(ContextSection(
+            "ACTIVE ADMISSION TASKS", [f"{t.title} (Status: {t.status})" for t in pending], priority=3, order=3
+        ))
+    if completed:
+        sections.append(ContextSection(
+            "COMPLETED TASKS", [t.title for t in completed], priority=6, order=4
+        ))
+    return sections
+
+def build_prompt_context(sections: list, summary: str, history: list, fixed_text: str, budget: int = None) -> PromptContext:
+    """
+    Fills the token budget in priority order: profile, decision pipeline, pending tasks,
+    the rolling conversation summary, recent history (newest first), completed tasks.
+
+    `history` is chronological [{"role", "text"}]; `fixed_text` is everything sent regardless
+    (system prompt, instructions and the new user message).
+    """
+    budget = budget or CHAT_PROMPT_TOKEN_BUDGET
+    all_sections = list(sections)
+    if summary:
+        all_sections.append(ContextSection("EARLIER CONVERSATION SUMMARY", [summary], priority=4, order=5))
+    all_sections.append(ContextSection(None, list(reversed(history)), priority=5, order=0, is_history=True))
+
+    used = estimate_tokens(fixed_text)
+    kept = {}
+    for section in sorted(all_sections, key=lambda s: s.priority):
+        items = []
+        for item in section.items:
+            cost = section.item_tokens(item) + (0 if items else section.header_tokens())
+            if used + cost > budget:
+                break
+            used += cost
+            items.append(item)
+        kept[section] = items
+
+    context = ""
+    history_out = []
+    for section in sorted(all_sections, key=lambda s: s.order):
+        items = kept[section]
+        if not items:
+            continue
+        if section.is_history:
+            history_out = list(reversed(items))
+        else:
+            context += ("\n" if context else "") + section.render(items)
+
+    return PromptContext(context, history_out, used)
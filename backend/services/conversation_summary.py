@@ -0,0 +1,65 @@
+from fastapi.concurrency import run_in_threadpool
+from models import database, models
+from services.ai_service import summarize_conversation
+import os
+
+# Newest messages always sent raw; everything older is folded into the summary in batches
+CHAT_SUMMARY_KEEP_RECENT = int(os.getenv("CHAT_SUMMARY_KEEP_RECENT", "8"))
+CHAT_SUMMARY_BATCH = int(os.getenv("CHAT_SUMMARY_BATCH", "10"))
+
+def _load_unsummarized(user_id: int):
+    db = database.SessionLocal()
+    try:
+        summary = db.query(models.ConversationSummary).filter(models.ConversationSummary.user_id == user_id).first()
+        watermark = summary.last_message_id if summary else 0
+        previous = summary.summary if summary else ""
+
+        # One batch at a time, and only once a full batch sits behind the recent window: a long backlog
+        # is worked off over several refreshes instead of in one huge prompt
+        messages = db.query(models.ChatMessage.id, models.ChatMessage.role, models.ChatMessage.text).filter(
+            models.ChatMessage.user_id == user_id,
+            models.ChatMessage.id > watermark
+        ).order_by(models.ChatMessage.id.asc()).limit(CHAT_SUMMARY_BATCH + CHAT_SUMMARY_KEEP_RECENT).all()
+
+        to_fold = messages[:CHAT_SUMMARY_BATCH] if len(messages) == CHAT_SUMMARY_BATCH + CHAT_SUMMARY_KEEP_RECENT else []
+        folded = [{"role": "assistant" if m.role == "bot" else "user", "text": m.text} for m in to_fold]
+        new_watermark = to_fold[-1].id if to_fold else watermark
+        return previous, watermark, folded, new_watermark
+    finally:
+        db.close()
+
+def _store_summary(user_id: int, expected_watermark: int, text: str, new_watermark: int):
+    db = database.SessionLocal()
+    try:
+        if expected_watermark == 0:
+            exists = db.query(models.ConversationSummary.id).filter(models.ConversationSummary.user_id == user_id).first()
+            if not exists:
+                db.add(models.ConversationSummary(user_id=user_id, summary=text, last_message_id=new_watermark))
+                db.commit()
+                return
+
+        # Compare-and-set on the watermark, so a concurrent refresh from another worker isn't overwritten
+        db.query(models.ConversationSummary).filter(
+            models.ConversationSummary.user_id == user_id,
+            models.ConversationSummary.last_message_id == expected_watermark
+        ).update({"summary": text, "last_message_id": new_watermark}, synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Summary save error: {e}")
+    finally:
+        db.close()
+
+async def refresh_conversation_summary(user_id: int):
+    """
+    Incrementally folds messages that fell out of the recent window into the user's rolling summary,
+    CHAT_SUMMARY_BATCH of them per call. Runs as a background task after a chat turn; does nothing
+    until a full batch has accumulated.
+    """
+    previous, watermark, to_fold, new_watermark = await run_in_threadpool(_load_unsummarized, user_id)
+    if len(to_fold) < CHAT_SUMMARY_BATCH:
+        return
+
+    summary = await summarize_conversation(previous, to_fold)
+    if summary:
+        await run_in_threadpool(_store_summary, user_id, watermark, summary, new_watermark)
@@ -0,0 +1,246 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import models
+from services.ai_service import get_interview_response, stream_interview_response
+import os
+
+# Latest turns sent to the LLM with each answer; the whole session stays in interview_turns
+INTERVIEW_CONTEXT_TURNS = int(os.getenv("INTERVIEW_CONTEXT_TURNS", "10"))
+INTERVIEW_MODES = ("university", "visa")
+
+# Characters of the transcript kept in interviews.preview for history lists
+TRANSCRIPT_PREVIEW_CHARS = 200
+
+# Sessions are never resumed after this long; abandoned ones are saved to history when the user starts another
+INTERVIEW_SESSION_MAX_MINUTES = int(os.getenv("INTERVIEW_SESSION_MAX_MINUTES", "60"))
+
+# Visa interviews are time-bound: the officer starts concluding, then must give a verdict
+VISA_CONCLUDE_AFTER_SECONDS = 240
+VISA_TIME_LIMIT_SECONDS = 300
+
+async def get_locked_university(user_id: int, db: AsyncSession):
+    """(id, name, country) of the user's locked university, or None."""
+    result = await db.execute(
+        select(models.University.id, models.University.name, models.University.country)
+        .join(models.Shortlist, models.Shortlist.university_id == models.University.id)
+        .where(models.Shortlist.user_id == user_id, models.Shortlist.is_locked == True)
+        .limit(1)
+    )
+    return result.first()
+
+async def get_target_country(user_id: int, locked, db: AsyncSession) -> str:
+    # Priority for the country:
+    # 1. Country of the locked university
+    # 2. First country in preferred_countries
+    # 3. Default to USA
+    if locked:
+        return locked.country
+    countries = await db.scalar(select(models.Profile.preferred_countries).where(models.Profile.user_id == user_id).limit(1))
+    if isinstance(countries, list) and len(countries) > 0:
+        return countries[0]
+    return "USA"
+
+def build_interview_prompt(mode: str, locked, country: str) -> str:
+    """
+    Builds the interviewer persona (University Admissions Officer or Visa Officer) for the given mode.
+    `locked` is the row from get_locked_university, `country` the one from get_target_country.
+    """
+    system_prompt = ""
+    
+    if mode == "university":
+        uni_name = locked.name if locked else "a prestigious university"
+        uni_country = locked.country if locked else "the USA"
+        
+        system_prompt = f"""
+        You are a strict but fair Admissions Officer at **{uni_name}** in {uni_country}.
+        You are conducting a formal admissions interview with a prospective student.
+        
+        YOUR GOAL:
+        - Verify their passion for the field.
+        - Test their knowledge about {uni_name}.
+        - assess their fit for the program.
+        
+        GUIDELINES:
+        - Speak conversationally but professionally.
+        - Ask ONE question at a time.
+        - Keep responses concise (spoken speech is shorter than written text).
+        - If the student gives a good answer, acknowledge it briefly and move to a follow-up or next topic.
+        - If the answer is vague, press for details.
+        
+        Start by responding to their greeting or answer.
+        """
+        
+    elif mode == "visa":
+        system_prompt = f"""
+        You are a Visa Consular Officer for **{country}**.
+        You are conducting a visa interview.
+        
+        YOUR GOAL:
+        - Determine if the student is a genuine student.
+        - Assess their financial stability and intent to return (if applicable).
+        - Verify their ties to their home country.
+        
+        CRITICAL CONSTRAINT:
+        - This interview is strictly time-bound to 5 minutes.
+        - If the message includes [Time: >4 mins], start concluding the interview.
+        - If the message includes [Time: >5 mins], you MUST give a final verdict (Approved or Rejected) and end the conversation.
+        
+        GUIDELINES:
+        - Be professional, somewhat skeptical, and direct.
+        - Ask clear, specific questions (e.g., "Why this university?", "Who is sponsoring you?").
+        - Keep responses short.
+        - If the student's answer is suspicious or weak, grill them further.
+        
+        Start by responding to the student.
+        """
+        if locked:
+            system_prompt += f"\nYou know the student is planning to attend {locked.name}."
+
+    else:
+        system_prompt = "You are a generic interviewer."
+
+    # Construct the full context
+    return f"{system_prompt}\n\n[INSTRUCTIONS]: Response should be suitable for Text-to-Speech (no markdown, no bolding, no emojis, just plain text)."
+
+def interview_greeting(mode: str, locked, country: str) -> str:
+    if mode == "university":
+        uni_name = locked.name if locked else "your target university"
+        return f"Hello, thank you for joining me. I am the admissions officer for {uni_name}. Shall we begin?"
+    return f"Good morning. Please step forward. I am the Visa Officer for {country or 'USA'}. Can I see your passport?"
+
+def interview_phase(elapsed_seconds: int) -> str:
+    if elapsed_seconds > VISA_TIME_LIMIT_SECONDS:
+        return "verdict"
+    if elapsed_seconds > VISA_CONCLUDE_AFTER_SECONDS:
+        return "concluding"
+    return "in_progress"
+
+def time_marker(elapsed_seconds: int) -> str:
+    # The visa persona concludes and gives its verdict on the exact markers its prompt names
+    phase = interview_phase(elapsed_seconds)
+    if phase == "verdict":
+        return "[Time: >5 mins]"
+    if phase == "concluding":
+        return "[Time: >4 mins]"
+    return f"[Time: {elapsed_seconds // 60} mins {elapsed_seconds % 60} secs]"
+
+async def start_interview_session(user_id: int, mode: str, db: AsyncSession) -> dict:
+    """
+    Opens a session: the locked university and the persona are resolved here, once, and stored
+    with the interview. The officer's greeting is the first turn.
+    """
+    await end_stale_sessions(user_id, db)
+    locked = await get_locked_university(user_id, db)
+    country = await get_target_country(user_id, locked, db)
+    greeting = interview_greeting(mode, locked, country)
+
+    interview = models.Interview(
+        user_id=user_id,
+        interview_type=mode,
+        university_id=locked.id if mode == "university" and locked else None,
+        status="active",
+        system_prompt=build_interview_prompt(mode, locked, country),
+    )
+    interview.turns.append(models.InterviewTurn(role="model", text=greeting))
+    db.add(interview)
+    await db.commit()
+    return {
+        "session_id": interview.id,
+        "mode": mode,
+        "greeting": greeting,
+        "locked_university": locked.name if locked else None,
+        "target_country": country,
+    }
+
+def session_expiry() -> datetime:
+    return datetime.now(timezone.utc) - timedelta(minutes=INTERVIEW_SESSION_MAX_MINUTES)
+
+async def get_active_session(session_id: int, user_id: int, db: AsyncSession):
+    """(id, interview_type, system_prompt) of the user's running session, or None (also once it has expired)."""
+    result = await db.execute(
+        select(models.Interview.id, models.Interview.interview_type, models.Interview.system_prompt)
+        .where(
+            models.Interview.id == session_id, models.Interview.user_id == user_id, models.Interview.status == "active",
+            models.Interview.created_at > session_expiry(),
+        )
+    )
+    return result.first()
+
+async def end_stale_sessions(user_id: int, db: AsyncSession):
+    """Saves the user's expired, never ended sessions to history, like /end would have."""
+    stale = (await db.scalars(
+        select(models.Interview.id)
+        .where(models.Interview.user_id == user_id, models.Interview.status == "active", models.Interview.created_at <= session_expiry())
+    )).all()
+    for session_id in stale:
+        await end_interview_session(session_id, db)
+
+async def load_context_turns(session_id: int, db: AsyncSession, limit: int = INTERVIEW_CONTEXT_TURNS) -> list:
+    """The latest `limit` turns, oldest first, in the provider router's history format."""
+    rows = (await db.execute(
+        select(models.InterviewTurn.role, models.InterviewTurn.text)
+        .where(models.InterviewTurn.interview_id == session_id)
+        .order_by(models.InterviewTurn.id.desc())
+        .limit(limit)
+    )).all()
+    return [{"role": "assistant" if row.role == "model" else "user", "text": row.text} for row in reversed(rows)]
+
+async def add_exchange(session_id: int, message: str, response: str, db: AsyncSession):
+    # The answer and the reply are stored together, so history never holds an answer without its reply
+    db.add_all([
+        models.InterviewTurn(interview_id=session_id, role="user", text=message),
+        models.InterviewTurn(interview_id=session_id, role="model", text=response),
+    ])
+    await db.commit()
+
+async def prepare_turn(session, message: str, elapsed_seconds, db: AsyncSession):
+    """
+    Returns (llm input, history) for the officer's reply to the student's answer.
+    The connection goes back to the pool here, so none is held while the LLM answers.
+    """
+    history = await load_context_turns(session.id, db)
+    await db.close()
+    if session.interview_type == "visa" and elapsed_seconds is not None:
+        message = f"{message} {time_marker(elapsed_seconds)}"
+    return message, history
+
+async def run_interview_turn(session, message: str, elapsed_seconds, db: AsyncSession) -> str:
+    user_input, history = await prepare_turn(session, message, elapsed_seconds, db)
+    # Groq first for speed, the provider router handles fallback and unhealthy providers
+    response = await get_interview_response(session.system_prompt, user_input, history=history)
+    await add_exchange(session.id, message, response, db)
+    return response
+
+async def stream_interview_turn(session, message: str, elapsed_seconds, db: AsyncSession):
+    """
+    run_interview_turn, yielding the reply as text deltas. The answer and the full reply are stored
+    once the reply is complete; an abandoned stream stores neither.
+    """
+    user_input, history = await prepare_turn(session, message, elapsed_seconds, db)
+    chunks = []
+    async for delta in stream_interview_response(session.system_prompt, user_input, history=history):
+        chunks.append(delta)
+        yield delta
+    await add_exchange(session.id, message, "".join(chunks), db)
+
+def transcript_preview(transcript: str) -> str:
+    if len(transcript) > TRANSCRIPT_PREVIEW_CHARS:
+        return transcript[:TRANSCRIPT_PREVIEW_CHARS] + "..."
+    return transcript
+
+async def end_interview_session(session_id: int, db: AsyncSession) -> str:
+    """Assembles the transcript from the stored turns and closes the session."""
+    rows = (await db.execute(
+        select(models.InterviewTurn.role, models.InterviewTurn.text)
+        .where(models.InterviewTurn.interview_id == session_id)
+        .order_by(models.InterviewTurn.id)
+    )).all()
+    transcript = "\n".join(f"{row.role.upper()}: {row.text}" for row in rows)
+    await db.execute(
+        update(models.Interview)
+        .where(models.Interview.id == session_id)
+        .values(transcript=transcript, preview=transcript_preview(transcript), status="completed")
+    )
+    await db.commit()
+    return transcript
@@ -0,0 +1,96 @@
+from utils.cache import LRUTTLCache
+import asyncio
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+
+def _normalize(value):
+    # Whitespace and case differences shouldn't produce different keys for the same prompt
+    if isinstance(value, str):
+        return re.sub(r"\s+", " ", value).strip().lower()
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+def make_cache_key(*parts) -> str:
+    payload = json.dumps(_normalize(list(parts)), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class SQLiteCacheBackend:
+    """
+    Persistent second level for the response cache so answers survive restarts.
+    WAL mode lets several uvicorn workers share the same file.
+    """
+
+    def __init__(self, path: str, ttl: float = 3600.0):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM llm_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + self.ttl),
+            )
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+            self._conn.commit()
+        return deleted
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class ResponseCache:
+    """
+    Memory LRU in front of an optional persistent backend. Backend I/O runs in a
+    worker thread so a cache lookup never blocks the event loop.
+    """
+
+    def __init__(self, memory: LRUTTLCache, backend: SQLiteCacheBackend = None):
+        self.memory = memory
+        self.backend = backend
+
+    async def get(self, key: str):
+        value = self.memory.get(key)
+        if value is None and self.backend is not None:
+            value = await asyncio.to_thread(self.backend.get, key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    async def set(self, key: str, value: str):
+        self.memory.set(key, value)
+        if self.backend is not None:
+            await asyncio.to_thread(self.backend.set, key, value)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.memory),
+            "hits": self.memory.hits,
+            "misses": self.memory.misses,
+            "evictions": self.memory.evictions,
+            "persistent": self.backend is not None,
+        }
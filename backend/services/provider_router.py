@@ -0,0 +1,253 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+
+class ProviderError(Exception):
+    """Raised when no provider could produce an answer."""
+
+class LLMProvider(ABC):
+    """
+    Interface the router talks to. The real Groq/Gemini providers live in ai_service,
+    tests and local setups can plug in fakes that implement `complete` (and optionally
+    `is_configured` and `stream`).
+    """
+    name = "provider"
+
+    def is_configured(self) -> bool:
+        return True
+
+    @abstractmethod
+    async def complete(self, system_prompt: str, user_input: str, history: list = None, temperature: float = None) -> str:
+        ...
+
+    async def stream(self, system_prompt: str, user_input: str, history: list = None, temperature: float = None):
+        # Providers without native streaming yield their full answer as one chunk
+        yield await self.complete(system_prompt, user_input, history=history, temperature=temperature)
+
+class CircuitBreaker:
+    """
+    Closed -> open -> half-open breaker for a single provider.
+    After `failure_threshold` consecutive failures the provider is skipped for `reset_timeout`
+    seconds, then one trial request decides whether it closes again or stays open.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+
+    def allow_request(self) -> bool:
+        if self.state == self.OPEN:
+            if self.clock() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+            self._trial_in_flight = False
+
+        if self.state == self.HALF_OPEN:
+            # Only a single probe goes through while the provider is on probation
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+        return True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = self.clock()
+        self._trial_in_flight = False
+
+    def release(self):
+        # A call that was cancelled (e.g. lost a hedge race) says nothing about the provider's health
+        self._trial_in_flight = False
+
+class ProviderHealth:
+    """Rolling health numbers for one provider, exposed for logging/metrics."""
+
+    def __init__(self):
+        self.successes = 0
+        self.failures = 0
+        self.latency_ewma = None
+        self.last_error = None
+
+    def record_success(self, latency: float):
+        self.successes += 1
+        self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+
+    def record_failure(self, error: Exception):
+        self.failures += 1
+        self.last_error = repr(error)
+
+class ProviderRouter:
+    """
+    Routes completions across providers in priority order.
+
+    - Providers whose circuit breaker is open are skipped instead of waited on.
+    - Every call is bounded by `provider_timeout` seconds.
+    - With `hedge_after` set (seconds), the next provider is fired when the current one
+      hasn't answered within the threshold and the first successful answer wins.
+    """
+
+    def __init__(self, providers: list, hedge_after: float = None, provider_timeout: float = None,
+                 failure_threshold: int = 3, reset_timeout: float = 30.0, clock=time.monotonic):
+        self.providers = list(providers)
+        self.hedge_after = hedge_after
+        self.provider_timeout = provider_timeout
+        self.breakers = {p.name: CircuitBreaker(failure_threshold, reset_timeout, clock) for p in self.providers}
+        self.health = {p.name: ProviderHealth() for p in self.providers}
+
+    def _configured(self):
+        return [p for p in self.providers if p.is_configured()]
+
+    def _record_success(self, provider, latency: float):
+        self.breakers[provider.name].record_success()
+        self.health[provider.name].record_success(latency)
+
+    def _record_failure(self, provider, error: Exception):
+        print(f"LLM provider {provider.name} failed: {error!r}")
+        self.breakers[provider.name].record_failure()
+        self.health[provider.name].record_failure(error)
+
+    async def _call(self, provider, kwargs: dict) -> str:
+        started = time.monotonic()
+        try:
+            call = provider.complete(**kwargs)
+            if self.provider_timeout:
+                result = await asyncio.wait_for(call, self.provider_timeout)
+            else:
+                result = await call
+        except asyncio.CancelledError:
+            self.breakers[provider.name].release()
+            raise
+        except Exception as e:
+            self._record_failure(provider, e)
+            raise
+        self._record_success(provider, time.monotonic() - started)
+        return result
+
+    async def complete(self, system_prompt: str, user_input: str, history: list = None, temperature: float = None) -> str:
+        kwargs = {"system_prompt": system_prompt, "user_input": user_input, "history": history, "temperature": temperature}
+        if self.hedge_after is None:
+            return await self._complete_sequential(kwargs)
+        return await self._complete_hedged(kwargs)
+
+    async def _complete_sequential(self, kwargs: dict) -> str:
+        last_error = None
+        for provider in self._configured():
+            if not self.breakers[provider.name].allow_request():
+                continue
+            try:
+                return await self._call(provider, kwargs)
+            except Exception as e:
+                last_error = e
+        raise ProviderError("No LLM provider could answer") from last_error
+
+    async def _complete_hedged(self, kwargs: dict) -> str:
+        waiting = self._configured()
+        running = {}
+        last_error = None
+
+        def launch_next():
+            while waiting:
+                provider = waiting.pop(0)
+                if self.breakers[provider.name].allow_request():
+                    running[asyncio.ensure_future(self._call(provider, kwargs))] = provider
+                    return
+
+        launch_next()
+        try:
+            while running:
+                done, _ = await asyncio.wait(
+                    list(running),
+                    timeout=self.hedge_after if waiting else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    # Current provider is slow: hedge with the next one and take whichever answers first
+                    launch_next()
+                    continue
+
+                for task in done:
+                    running.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+                # A failure doesn't have to wait out the hedge delay
+                launch_next()
+        finally:
+            for task in running:
+                task.cancel()
+
+        raise ProviderError("No LLM provider could answer") from last_error
+
+    async def _next_delta(self, deltas):
+        if self.provider_timeout:
+            return await asyncio.wait_for(deltas.__anext__(), self.provider_timeout)
+        return await deltas.__anext__()
+
+    async def stream(self, system_prompt: str, user_input: str, history: list = None, temperature: float = None):
+        """
+        Streams from the first healthy provider. A provider that fails (or stays silent for
+        `provider_timeout` seconds) before its first token falls through to the next one; once
+        tokens were sent a failure or stall raises ProviderError, since another provider can't
+        continue a half-finished answer.
+        """
+        last_error = None
+        for provider in self._configured():
+            breaker = self.breakers[provider.name]
+            if not breaker.allow_request():
+                continue
+
+            started = time.monotonic()
+            produced = False
+            deltas = provider.stream(system_prompt, user_input, history=history, temperature=temperature)
+            try:
+                while True:
+                    try:
+                        delta = await self._next_delta(deltas)
+                    except StopAsyncIteration:
+                        break
+                    produced = True
+                    yield delta
+            except (asyncio.CancelledError, GeneratorExit):
+                breaker.release()
+                raise
+            except Exception as e:
+                self._record_failure(provider, e)
+                if produced:
+                    raise ProviderError("LLM stream interrupted") from e
+                last_error = e
+                continue
+            finally:
+                # Closes the provider's response if it stalled or the consumer went away
+                await deltas.aclose()
+
+            self._record_success(provider, time.monotonic() - started)
+            return
+
+        raise ProviderError("No LLM provider could answer") from last_error
+
+    def snapshot(self) -> dict:
+        return {
+            p.name: {
+                "state": self.breakers[p.name].state,
+                "consecutive_failures": self.breakers[p.name].consecutive_failures,
+                "successes": self.health[p.name].successes,
+                "failures": self.health[p.name].failures,
+                "latency_ewma": self.health[p.name].latency_ewma,
+                "last_error": self.health[p.name].last_error,
+            }
+            for p in self.providers
+        }
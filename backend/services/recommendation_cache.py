@@ -0,0 +1,56 @@
+from utils.cache import LRUTTLCache
+from .llm_cache import make_cache_key
+from .recommendation_engine import normalize_country
+import os
+
+RECOMMENDATION_CACHE_MAX_ENTRIES = int(os.getenv("RECOMMENDATION_CACHE_MAX_ENTRIES", "2048"))
+RECOMMENDATION_PROFILE_TTL_SECONDS = float(os.getenv("RECOMMENDATION_PROFILE_TTL_SECONDS", "300"))
+RECOMMENDATION_WARMUP_PROFILES = int(os.getenv("RECOMMENDATION_WARMUP_PROFILES", "50"))
+
+# The profile fields recommendation scoring depends on
+SCORING_FIELDS = ("gpa", "exam_scores", "budget_range", "preferred_countries", "target_field")
+
+# "catalog version:fingerprint" -> recommendations, shared by every student with the same scoring
+# fields. No TTL: once the catalog changes, entries for the old version are never hit and age out.
+_recommendations = LRUTTLCache(RECOMMENDATION_CACHE_MAX_ENTRIES, ttl=float("inf"))
+
+# user_id -> scoring fields, so a dashboard load doesn't have to read the profile. PUT /api/profile/me
+# invalidates its own worker's entry; the TTL bounds how long another worker can serve the old fields.
+_profiles = LRUTTLCache(RECOMMENDATION_CACHE_MAX_ENTRIES, ttl=RECOMMENDATION_PROFILE_TTL_SECONDS)
+
+def profile_fingerprint(profile: dict) -> str:
+    """Stable key over SCORING_FIELDS; profiles that score the same get the same fingerprint."""
+    gpa = profile.get("gpa")
+    return make_cache_key(
+        round(gpa, 2) if isinstance(gpa, (int, float)) else None,
+        {str(exam).upper(): score for exam, score in (profile.get("exam_scores") or {}).items()},
+        profile.get("budget_range") or "",
+        sorted({normalize_country(c) for c in profile.get("preferred_countries") or []}),
+        profile.get("target_field") or "",
+    )
+
+def get_cached_recommendations(fingerprint: str, catalog_version: int):
+    return _recommendations.get(f"{catalog_version}:{fingerprint}")
+
+def set_cached_recommendations(fingerprint: str, catalog_version: int, recommendations: dict):
+    _recommendations.set(f"{catalog_version}:{fingerprint}", recommendations)
+
+def get_recommendation_profile(user_id: int):
+    """Returns the cached scoring fields for the user, or None."""
+    return _profiles.get(user_id)
+
+def set_recommendation_profile(user_id: int, profile: dict):
+    _profiles.set(user_id, profile)
+
+def invalidate_recommendation_profile(user_id: int):
+    """Call after committing a change to any of the user's SCORING_FIELDS."""
+    _profiles.delete(user_id)
+
+def recommendation_cache_stats() -> dict:
+    return {
+        "entries": len(_recommendations),
+        "hits": _recommendations.hits,
+        "misses": _recommendations.misses,
+        "evictions": _recommendations.evictions,
+        "profiles": len(_profiles),
+    }
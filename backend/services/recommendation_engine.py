@@ -0,0 +1,268 @@
+import math
+import re
+import threading
+import numpy as np
+from .search_index import normalize_text
+from .compact_catalog import as_doc
+
+CATEGORIES = ("Dream", "Target", "Safe")
+RECOMMENDATIONS_PER_CATEGORY = 4
+
+# Estimated admission chance thresholds. For an average student (strength 0.6) the chance
+# equals the acceptance rate, so this matches the old "< 15% / 15-45% / > 45%" split.
+DREAM_MAX_CHANCE = 0.15
+SAFE_MIN_CHANCE = 0.45
+AVERAGE_STRENGTH = 0.6
+STRENGTH_SENSITIVITY = 2.0
+
+# Score ranges used to put exams on a common 0..1 scale
+EXAM_RANGES = {
+    "GRE": (260, 340),
+    "GMAT": (200, 800),
+    "SAT": (400, 1600),
+    "TOEFL": (0, 120),
+    "IELTS": (0, 9),
+}
+
+COUNTRY_ALIASES = {
+    "us": "usa", "united states": "usa", "united states of america": "usa",
+    "united kingdom": "uk", "england": "uk", "great britain": "uk",
+}
+
+def normalize_country(country) -> str:
+    name = " ".join(str(country or "").lower().split())
+    return COUNTRY_ALIASES.get(name, name)
+
+def _to_float(value) -> float:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return math.nan
+    return number if math.isfinite(number) else math.nan
+
+def student_strength(profile: dict) -> float:
+    """GPA and exam scores folded into 0..1; AVERAGE_STRENGTH when the profile has neither."""
+    parts = []
+    gpa = _to_float(profile.get("gpa"))
+    if gpa > 0:
+        # 4.0 scale, 10 point CGPA or percentage
+        scale = 4.0 if gpa <= 4 else 10.0 if gpa <= 10 else 100.0
+        parts.append((min(gpa / scale, 1.0), 0.6))
+
+    exams = []
+    for exam, score in (profile.get("exam_scores") or {}).items():
+        bounds = EXAM_RANGES.get(str(exam).upper())
+        score = _to_float(score)
+        if bounds and not math.isnan(score):
+            low, high = bounds
+            exams.append(min(max((score - low) / (high - low), 0.0), 1.0))
+    if exams:
+        parts.append((sum(exams) / len(exams), 0.4))
+
+    if not parts:
+        return AVERAGE_STRENGTH
+    return sum(value * weight for value, weight in parts) / sum(weight for _, weight in parts)
+
+def parse_budget(budget_range) -> float:
+    """Upper bound in USD of a budget like "$20k - $40k" or "< $20k"; inf for "$60k+" or unknown."""
+    text = str(budget_range or "").lower().replace(",", "")
+    if not text or "+" in text:
+        return math.inf
+    amounts = [float(n) * (1000 if k else 1) for n, k in re.findall(r"(\d+(?:\.\d+)?)\s*(k?)", text)]
+    return max(amounts) if amounts else math.inf
+
+def has_stats(acceptance, ranking) -> bool:
+    """
+    Whether a university can be recommended: it needs an acceptance rate or a ranking. Rows without
+    either are placeholders for names students shortlisted, so their category would be made up.
+    """
+    return _to_float(acceptance) > 0 or _to_float(ranking) > 0
+
+def _prestige(acceptance: np.ndarray, ranking: np.ndarray) -> np.ndarray:
+    # Ranking when known (1 -> 1.0, 1000 -> 0.0), selectivity otherwise
+    ranked = np.clip(1 - np.log10(np.maximum(np.nan_to_num(ranking, nan=1), 1)) / 3, 0, 1)
+    return np.where(np.isnan(ranking), 1 - acceptance, ranked).astype(np.float32)
+
+class RecommendationCatalog:
+    """
+    Universities stored as NumPy columns (acceptance rate, tuition, country code, ranking)
+    so a profile is scored against the whole catalog in one vectorized pass. New rows are
+    staged in lists and appended to the columns in one go on the next query.
+    `version` changes with every add/remove, so cached results can tell they are outdated.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.docs = []              # row -> result dict (MOCK_DATA shape)
+        self.rows = {}              # key -> row
+        self.names = {}             # normalized name -> key, to skip duplicates
+        self.country_codes = {}     # normalized country -> code
+        self.acceptance = np.empty(0, dtype=np.float32)
+        self.tuition = np.empty(0, dtype=np.float32)
+        self.country = np.empty(0, dtype=np.int32)
+        self.ranking = np.empty(0, dtype=np.float32)
+        self.prestige = np.empty(0, dtype=np.float32)
+        self.active = np.empty(0, dtype=bool)
+        self.removed = 0
+        self.version = 0
+        self._staged = []
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _country_code(self, country) -> int:
+        return self.country_codes.setdefault(normalize_country(country), len(self.country_codes))
+
+    def _columns(self, doc: dict) -> tuple:
+        acceptance = _to_float(doc.get("latest.admissions.admission_rate.overall"))
+        ranking = _to_float(doc.get("ranking"))
+        if not acceptance > 0:
+            acceptance = 0.5  # unknown, the old default
+        return (
+            min(acceptance, 1.0),
+            _to_float(doc.get("latest.cost.tuition.out_of_state")),
+            self._country_code(doc.get("school.country")),
+            ranking if ranking > 0 else math.nan,
+        )
+
+    def add(self, key, doc: dict) -> bool:
+        """
+        Adds or replaces one university. Returns False if another key already has its name, or if it
+        has neither an acceptance rate nor a ranking (then any earlier version of it is removed).
+        """
+        name = normalize_text(doc.get("school.name"))
+        if not name:
+            return False
+        if not has_stats(doc.get("latest.admissions.admission_rate.overall"), doc.get("ranking")):
+            self.remove(key)
+            return False
+        with self._lock:
+            if name in self.names and self.names[name] != key:
+                return False
+            row = self.rows.get(key)
+            columns = self._columns(doc)
+            if row is None:
+                self.rows[key] = len(self.docs)
+                self.docs.append(doc)
+                self._staged.append(columns)
+            elif row >= len(self.acceptance):
+                # Still staged
+                self.names.pop(normalize_text(self.docs[row].get("school.name")), None)
+                self.docs[row] = doc
+                self._staged[row - len(self.acceptance)] = columns
+            else:
+                self.names.pop(normalize_text(self.docs[row].get("school.name")), None)
+                self.docs[row] = doc
+                self.acceptance[row], self.tuition[row], self.country[row], self.ranking[row] = columns
+                self.prestige[row] = _prestige(self.acceptance[row:row + 1], self.ranking[row:row + 1])[0]
+            self.names[name] = key
+            self.version += 1
+            return True
+
+    def add_compact(self, catalog, rows=None) -> int:
+        """
+        Bulk-adds the rows of a CompactCatalog (or the given views of it). Columns are sliced out of
+        the mapped file in one go; only the row views (two slots each) are per-row Python objects.
+        Returns the number added.
+        """
+        with self._lock:
+            self._materialize()
+            keep = []
+            for row in rows if rows is not None else catalog:
+                key = row.key
+                name = normalize_text(row.name)
+                if not name or name in self.names or key in self.rows:
+                    continue
+                if not has_stats(catalog.acceptance[row.index], catalog.ranking[row.index]):
+                    continue
+                self.names[name] = key
+                self.rows[key] = len(self.docs)
+                self.docs.append(row)
+                keep.append(row.index)
+            if not keep:
+                return 0
+
+            keep = np.array(keep, dtype=np.int64)
+            acceptance = catalog.acceptance[keep]
+            acceptance = np.where(acceptance > 0, np.minimum(acceptance, 1.0), 0.5).astype(np.float32)  # NaN > 0 is False
+            ranking = catalog.ranking[keep]
+            ranking = np.where(ranking > 0, ranking, np.nan).astype(np.float32)
+            # Catalog string ids -> this catalog's country codes
+            country_sids, inverse = np.unique(catalog.country_sid[keep], return_inverse=True)
+            codes = np.array([self._country_code(catalog.string(sid)) for sid in country_sids], dtype=np.int32)
+
+            self.acceptance = np.concatenate([self.acceptance, acceptance])
+            self.tuition = np.concatenate([self.tuition, catalog.tuition[keep].astype(np.float32)])
+            self.country = np.concatenate([self.country, codes[inverse.ravel()]])
+            self.ranking = np.concatenate([self.ranking, ranking])
+            self.prestige = np.concatenate([self.prestige, _prestige(acceptance, ranking)])
+            self.active = np.concatenate([self.active, np.ones(len(keep), dtype=bool)])
+            self.version += 1
+            return len(keep)
+
+    def remove(self, key):
+        with self._lock:
+            row = self.rows.pop(key, None)
+            if row is None:
+                return
+            self._materialize()
+            self.active[row] = False
+            self.removed += 1
+            self.version += 1
+            self.names.pop(normalize_text(self.docs[row].get("school.name")), None)
+
+    def _materialize(self):
+        if not self._staged:
+            return
+        acceptance, tuition, country, ranking = zip(*self._staged)
+        self.acceptance = np.concatenate([self.acceptance, np.array(acceptance, dtype=np.float32)])
+        self.tuition = np.concatenate([self.tuition, np.array(tuition, dtype=np.float32)])
+        self.country = np.concatenate([self.country, np.array(country, dtype=np.int32)])
+        self.ranking = np.concatenate([self.ranking, np.array(ranking, dtype=np.float32)])
+        staged = len(self._staged)
+        self.prestige = np.concatenate([self.prestige, _prestige(self.acceptance[-staged:], self.ranking[-staged:])])
+        self.active = np.concatenate([self.active, np.ones(staged, dtype=bool)])
+        self._staged = []
+
+    def recommend(self, profile: dict, limit: int = RECOMMENDATIONS_PER_CATEGORY) -> dict:
+        profile = profile or {}
+        strength = student_strength(profile)
+        budget = parse_budget(profile.get("budget_range"))
+        preferred = [normalize_country(c) for c in (profile.get("preferred_countries") or [])]
+
+        with self._lock:
+            self._materialize()
+
+            # Admission chance: the acceptance rate scaled up or down by the student's strength
+            chance = self.acceptance * np.float32(math.exp(STRENGTH_SENSITIVITY * (strength - AVERAGE_STRENGTH)))
+            # 0 = Dream, 1 = Target, 2 = Safe
+            bucket = (chance >= DREAM_MAX_CHANCE).astype(np.int8) + (chance > SAFE_MIN_CHANCE)
+            if self.removed:
+                bucket[~self.active] = -1
+
+            # Fit within a category: country preference, then budget, then prestige
+            score = self.prestige * np.float32(0.5)
+            if preferred:
+                # Lookup table by country code; much cheaper than np.isin over the whole catalog
+                country_fit = np.zeros(len(self.country_codes), dtype=np.float32)
+                country_fit[[self.country_codes[c] for c in preferred if c in self.country_codes]] = 2.0
+                score += country_fit[self.country]
+            if not math.isinf(budget):
+                over = np.maximum(self.tuition / np.float32(budget) - 1, 0)
+                score += np.where(np.isnan(self.tuition), np.float32(0.5), 1 / (1 + 4 * over))
+
+            return {
+                category: [as_doc(self.docs[row]) for row in self._top_k(score, np.flatnonzero(bucket == index), limit)]
+                for index, category in enumerate(CATEGORIES)
+            }
+
+    @staticmethod
+    def _top_k(score: np.ndarray, candidates: np.ndarray, k: int) -> list:
+        if k <= 0 or not len(candidates):
+            return []
+        if len(candidates) > k:
+            # O(n) partition, then only the k winners get sorted
+            candidates = candidates[np.argpartition(-score[candidates], k - 1)[:k]]
+        # Stable on row order, so equal scores keep catalog order
+        order = np.lexsort((candidates, -score[candidates]))
+        return candidates[order].tolist()
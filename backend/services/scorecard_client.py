@@ -0,0 +1,134 @@
+from utils.cache import LRUTTLCache
+import asyncio
+import httpx
+import os
+import re
+import time
+
+SCORECARD_BASE_URL = os.getenv("SCORECARD_BASE_URL", "https://api.data.gov/ed/collegescorecard/v1/schools.json")
+SCORECARD_TIMEOUT_SECONDS = float(os.getenv("SCORECARD_TIMEOUT_SECONDS", "5"))
+SCORECARD_MAX_CONNECTIONS = int(os.getenv("SCORECARD_MAX_CONNECTIONS", "20"))
+# Fresh for CACHE_TTL; after that served stale (and refreshed in the background) until STALE_TTL
+SCORECARD_CACHE_TTL_SECONDS = float(os.getenv("SCORECARD_CACHE_TTL_SECONDS", "600"))
+SCORECARD_STALE_TTL_SECONDS = float(os.getenv("SCORECARD_STALE_TTL_SECONDS", "86400"))
+SCORECARD_CACHE_MAX_ENTRIES = int(os.getenv("SCORECARD_CACHE_MAX_ENTRIES", "2048"))
+
+SCORECARD_FIELDS = "id,school.name,school.city,school.state,latest.cost.tuition.out_of_state,latest.admissions.admission_rate.overall,school.school_url"
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query or "").strip().lower()
+
+def normalize_result(r: dict) -> dict:
+    # Normalizing keys
+    r["school.country"] = "USA"
+    if r.get("latest.cost.tuition.out_of_state") is None:
+        r["latest.cost.tuition.out_of_state"] = "N/A"
+    if r.get("latest.admissions.admission_rate.overall") is None:
+        r["latest.admissions.admission_rate.overall"] = 0.0
+
+    # Fix URL if missing http
+    website = r.get("school.school_url")
+    if website and not website.startswith("http"):
+        r["website"] = f"https://{website}"
+    else:
+        r["website"] = website
+    return r
+
+class ScorecardClient:
+    """
+    Async College Scorecard search with a pooled HTTP client.
+
+    - Results are cached per normalized query; stale entries are served immediately
+      while a background request refreshes them.
+    - Concurrent lookups of the same query share one upstream request.
+    - After an upstream error, requests back off exponentially (cached data is still served).
+    """
+
+    def __init__(self, api_key: str, base_url: str = SCORECARD_BASE_URL, ttl: float = SCORECARD_CACHE_TTL_SECONDS,
+                 stale_ttl: float = SCORECARD_STALE_TTL_SECONDS, max_entries: int = SCORECARD_CACHE_MAX_ENTRIES,
+                 timeout: float = SCORECARD_TIMEOUT_SECONDS, max_connections: int = SCORECARD_MAX_CONNECTIONS,
+                 backoff_base: float = 1.0, backoff_max: float = 60.0, clock=time.monotonic):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.ttl = ttl
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.clock = clock
+        self._cache = LRUTTLCache(max_entries, ttl=stale_ttl, clock=clock)
+        self._inflight = {}
+        self._client = None
+        self.failures = 0
+        self.backoff_until = 0.0
+        self.upstream_requests = 0
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            )
+        return self._client
+
+    def _backing_off(self) -> bool:
+        return self.clock() < self.backoff_until
+
+    async def search(self, query: str) -> list:
+        key = normalize_query(query)
+        if not key:
+            return []
+
+        entry = self._cache.get(key)
+        if entry is not None:
+            fetched_at, results = entry
+            if self.clock() - fetched_at >= self.ttl and not self._backing_off():
+                # Stale: answer now, refresh for the next caller
+                self._start_fetch(key)
+            return results
+
+        if self._backing_off():
+            return []
+        # shield: one caller going away must not cancel the request others are waiting on
+        return await asyncio.shield(self._start_fetch(key))
+
+    def _start_fetch(self, key: str) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    async def _fetch(self, key: str) -> list:
+        params = {
+            "api_key": self.api_key,
+            "school.search": key,
+            "fields": SCORECARD_FIELDS,
+            "per_page": 10,
+            "sort": "latest.admissions.admission_rate.overall:asc"
+        }
+        self.upstream_requests += 1
+        try:
+            response = await self._get_client().get(self.base_url, params=params)
+            response.raise_for_status()
+            results = [normalize_result(r) for r in response.json().get("results", [])]
+        except Exception as e:
+            self.failures += 1
+            self.backoff_until = self.clock() + min(self.backoff_max, self.backoff_base * 2 ** (self.failures - 1))
+            # Not the exception text: it contains the request URL and with it the API key
+            reason = e.response.status_code if isinstance(e, httpx.HTTPStatusError) else type(e).__name__
+            print(f"Scorecard API Error: {reason}, backing off")
+            # Errors are never cached; a stale entry (if any) keeps being served
+            entry = self._cache.get(key)
+            return entry[1] if entry is not None else []
+
+        self.failures = 0
+        self.backoff_until = 0.0
+        self._cache.set(key, (self.clock(), results))
+        return results
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
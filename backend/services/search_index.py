@@ -0,0 +1,171 @@
+from utils.text import normalize_text
+import heapq
+import threading
+
+# Field weights: a hit on the name counts more than a hit on the city or country
+FIELD_WEIGHTS = {"name": 3.0, "city": 1.5, "state": 1.0, "country": 1.0}
+FIELD_KEYS = {"name": "school.name", "city": "school.city", "state": "school.state", "country": "school.country"}
+
+# How well a query term matched a word of the document
+EXACT, PREFIX, INFIX = 1.0, 0.8, 0.6
+FUZZY_MIN_SIMILARITY = 0.45
+MAX_PREFIX_LENGTH = 12
+
+def _trigrams(word: str) -> set:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class UniversitySearchIndex:
+    """
+    Inverted index over university name, city, state and country.
+
+    Documents are split into words; a vocabulary of unique words carries a prefix index
+    and a trigram index, so a query term resolves to matching words with a couple of dict
+    lookups and only then fans out to the documents containing them. Unknown terms fall
+    back to trigram similarity, which gives typo tolerance ("stanfrod" -> "stanford").
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.docs = {}            # key -> result dict (MOCK_DATA shape)
+        self.doc_order = {}       # key -> insertion order, used as the final tie-breaker
+        self.doc_words = {}       # key -> [(word_id, field)]
+        self.names = {}           # normalized name -> key, to skip duplicates
+        self.words = []           # word_id -> word
+        self.word_ids = {}        # word -> word_id
+        self.postings = []        # word_id -> {key: best field weight}
+        self.prefixes = {}        # prefix -> set(word_id)
+        self.trigrams = {}        # trigram -> set(word_id)
+
+    def __len__(self):
+        return len(self.docs)
+
+    def _word_id(self, word: str) -> int:
+        word_id = self.word_ids.get(word)
+        if word_id is None:
+            word_id = len(self.words)
+            self.words.append(word)
+            self.word_ids[word] = word_id
+            self.postings.append({})
+            for size in range(1, min(len(word), MAX_PREFIX_LENGTH) + 1):
+                self.prefixes.setdefault(word[:size], set()).add(word_id)
+            for gram in _trigrams(word):
+                self.trigrams.setdefault(gram, set()).add(word_id)
+        return word_id
+
+    def add(self, key, doc: dict) -> bool:
+        """Indexes one university. Returns False if a university with the same name is already indexed."""
+        name = normalize_text(doc.get("school.name"))
+        if not name:
+            return False
+        with self._lock:
+            if name in self.names and self.names[name] != key:
+                return False
+            if key in self.docs:
+                self._remove(key)
+
+            entries = []
+            for field, doc_key in FIELD_KEYS.items():
+                weight = FIELD_WEIGHTS[field]
+                for word in normalize_text(doc.get(doc_key)).split():
+                    word_id = self._word_id(word)
+                    posting = self.postings[word_id]
+                    posting[key] = max(posting.get(key, 0.0), weight)
+                    entries.append((word_id, field))
+
+            self.docs[key] = doc
+            self.doc_order.setdefault(key, len(self.doc_order))
+            self.doc_words[key] = entries
+            self.names[name] = key
+            return True
+
+    def remove(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        doc = self.docs.pop(key, None)
+        if doc is None:
+            return
+        for word_id, _ in self.doc_words.pop(key, []):
+            self.postings[word_id].pop(key, None)
+        self.names.pop(normalize_text(doc.get("school.name")), None)
+
+    def _match_words(self, term: str) -> dict:
+        """word_id -> match quality for one query term."""
+        matches = {}
+        exact = self.word_ids.get(term)
+        if exact is not None:
+            matches[exact] = EXACT
+
+        for word_id in self.prefixes.get(term[:MAX_PREFIX_LENGTH], ()):
+            if word_id not in matches and self.words[word_id].startswith(term):
+                matches[word_id] = PREFIX
+        if matches or len(term) < 3:
+            return matches
+
+        # No word starts with the term: look for infix hits ("ford" in "stanford") and typos
+        term_grams = _trigrams(term)
+        overlap = {}
+        for gram in term_grams:
+            for word_id in self.trigrams.get(gram, ()):
+                overlap[word_id] = overlap.get(word_id, 0) + 1
+        for word_id, shared in overlap.items():
+            word = self.words[word_id]
+            if term in word:
+                matches[word_id] = INFIX
+                continue
+            similarity = 2 * shared / (len(term_grams) + len(_trigrams(word)))
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                matches[word_id] = similarity * 0.5
+        return matches
+
+    def search(self, query: str, limit: int = 50) -> list:
+        terms = normalize_text(query).split()
+        if not terms:
+            return []
+
+        with self._lock:
+            scores = None
+            for term in terms:
+                term_scores = {}
+                for word_id, quality in self._match_words(term).items():
+                    for key, weight in self.postings[word_id].items():
+                        score = quality * weight
+                        if score > term_scores.get(key, 0.0):
+                            term_scores[key] = score
+
+                # Every term has to match somewhere in the document
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {key: score + term_scores[key] for key, score in scores.items() if key in term_scores}
+                if not scores:
+                    return []
+
+            # Whole query as the start of the name ranks first
+            phrase = " ".join(terms)
+            for key in scores:
+                if normalize_text(self.docs[key].get("school.name")).startswith(phrase):
+                    scores[key] += 2.0
+
+            best = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], self.doc_order[item[0]]))
+            return [self.docs[key] for key, _ in best]
+
+# University columns university_to_doc reads
+UNIVERSITY_DOC_COLUMNS = ("id", "name", "location", "country", "tuition_fee", "acceptance_rate", "ranking", "details")
+
+def university_to_doc(uni) -> dict:
+    """Shapes a University row like the catalog/Scorecard results the frontend already renders."""
+    details = uni.details or {}
+    return {
+        "id": f"db-{uni.id}",
+        "school.name": uni.name,
+        "school.city": details.get("school.city") or uni.location or "",
+        "school.state": details.get("school.state", ""),
+        "school.country": uni.country or "",
+        "latest.cost.tuition.out_of_state": uni.tuition_fee if uni.tuition_fee is not None else "N/A",
+        "latest.admissions.admission_rate.overall": uni.acceptance_rate or 0.0,
+        "website": details.get("website"),
+        "ranking": uni.ranking,
+    }
@@ -0,0 +1,23 @@
+from utils.cache import LRUTTLCache
+import os
+
+# Rendered profile/shortlist/tasks context per user. Write paths invalidate their own worker's entry;
+# the TTL bounds how long another worker can keep serving a snapshot from before a change.
+SNAPSHOT_CACHE_MAX_ENTRIES = int(os.getenv("SNAPSHOT_CACHE_MAX_ENTRIES", "5000"))
+SNAPSHOT_CACHE_TTL_SECONDS = float(os.getenv("SNAPSHOT_CACHE_TTL_SECONDS", "120"))
+
+_snapshots = LRUTTLCache(SNAPSHOT_CACHE_MAX_ENTRIES, ttl=SNAPSHOT_CACHE_TTL_SECONDS)
+
+def get_student_snapshot(user_id: int):
+    """Returns the cached list of ContextSections for the user, or None."""
+    return _snapshots.get(user_id)
+
+def set_student_snapshot(user_id: int, sections: list):
+    _snapshots.set(user_id, sections)
+
+def invalidate_student_snapshot(user_id: int):
+    """Call after committing any change to the user's profile, shortlist or tasks."""
+    _snapshots.delete(user_id)
+
+def snapshot_stats() -> dict:
+    return {"entries": len(_snapshots), "hits": _snapshots.hits, "misses": _snapshots.misses}
@@ -1,93 +1,115 @@
 from sqlalchemy.orm import Session
 from models import models
+from services.snapshot_cache import invalidate_student_snapshot
+import re
+
+# Mapping of stages to their core tasks
+STAGE_TASKS = {
+    "Building Profile": [
+        "Complete Initial Profile"
+    ],
+    "Stage 2: Discovering Universities": [
+        "Research University Programs",
+        "Broaden University Search"
+    ],
+    "Stage 3: Finalizing Universities": [
+        "Shortlist Universities",
+        "Prepare for GMAT/GRE"
+    ],
+    "Stage 4: Preparing Applications": [
+        "Lock Final Selection",
+        "Draft Statement of Purpose (SOP)",
+        "Request Letters of Recommendation (LOR)"
+    ]
+}
+
+STAGES = list(STAGE_TASKS.keys())
+
+def normalize_title(title: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", (title or "").lower()))
+
+def _match_phrase(title: str) -> str:
+    # Key phrases that also match differently worded tasks,
+    # e.g. "Draft SOP" vs "Draft Statement of Purpose (SOP)"
+    words = normalize_title(title).split()
+    check_phrase = normalize_title(title)
+    if "statement of purpose" in check_phrase: return "statement of purpose"
+    if "lor" in words: return "recommendation"
+    if "gmat" in words: return "gmat"
+    if "gre" in words: return "gre"
+    if "shortlist" in words: return "shortlist"
+    return check_phrase
+
+class StageTaskRule:
+    __slots__ = ("stage_index", "title", "match_phrase")
+
+    def __init__(self, stage_index: int, title: str):
+        self.stage_index = stage_index
+        self.title = title
+        self.match_phrase = _match_phrase(title)
+
+# Compiled once at import instead of on every sync
+STAGE_RULES = [StageTaskRule(idx, title) for idx, stage in enumerate(STAGES) for title in STAGE_TASKS[stage]]
+MATCH_PHRASES = {rule.match_phrase for rule in STAGE_RULES}
+
+def _index_tasks(tasks: list):
+    """
+    Builds exact-title and key-phrase lookups over the user's tasks in one pass,
+    so each stage rule is a dict lookup instead of a scan over every task.
+    Phrases match on whole words, so "gre" doesn't match "progress".
+    """
+    by_title = {}
+    by_phrase = {}
+    for task in tasks:
+        by_title.setdefault(task.title, task)
+        padded = f" {normalize_title(task.title)} "
+        for phrase in MATCH_PHRASES:
+            if f" {phrase} " in padded:
+                by_phrase.setdefault(phrase, task)
+    return by_title, by_phrase
 
 def sync_stage_tasks(user_id: int, current_stage: str, db: Session):
     """
     Synchronizes tasks based on the student's current stage.
     Flags previous stage tasks as completed and ensures current/next stage tasks exist.
+    Prefer ensure_stage_tasks, which skips the work when the stage hasn't changed.
     """
-    
-    # Mapping of stages to their core tasks
-    STAGE_TASKS = {
-        "Building Profile": [
-            "Complete Initial Profile"
-        ],
-        "Stage 2: Discovering Universities": [
-            "Research University Programs",
-            "Broaden University Search"
-        ],
-        "Stage 3: Finalizing Universities": [
-            "Shortlist Universities",
-            "Prepare for GMAT/GRE"
-        ],
-        "Stage 4: Preparing Applications": [
-            "Lock Final Selection",
-            "Draft Statement of Purpose (SOP)",
-            "Request Letters of Recommendation (LOR)"
-        ]
-    }
-
-    # 1. Ensure tasks for current stage exist (if they don't already)
-    # 2. Mark tasks from PREVIOUS stages as "Completed"
-    
-    stages = list(STAGE_TASKS.keys())
     try:
-        current_idx = stages.index(current_stage)
+        current_idx = STAGES.index(current_stage)
     except ValueError:
         current_idx = 0
 
-    # Fetch all current user tasks once to check for fuzzy duplicates
     all_user_tasks = db.query(models.Task).filter(models.Task.user_id == user_id).all()
-    user_task_titles = [t.title.lower() for t in all_user_tasks]
+    by_title, by_phrase = _index_tasks(all_user_tasks)
+
+    for rule in STAGE_RULES:
+        # Exact match first, then the fuzzy key phrase
+        matched_task = by_title.get(rule.title) or by_phrase.get(rule.match_phrase)
 
-    # Process all stages
-    for idx, stage in enumerate(stages):
-        task_titles = STAGE_TASKS[stage]
-        for title in task_titles:
-            # Check if task already exists (Fuzzy Match)
-            # We check if the exact title exists OR if a very similar one exists
-            # This prevents "Draft SOP" and "Draft Statement of Purpose (SOP)" co-existing
-            
-            exists = False
-            matched_task = None
-            
-            # 1. Exact match check
-            for t in all_user_tasks:
-                if t.title == title:
-                    exists = True
-                    matched_task = t
-                    break
-            
-            # 2. Fuzzy match if not exact
-            if not exists:
-                # Key phrases to check
-                check_phrase = title.lower()
-                if "statement of purpose" in check_phrase: check_phrase = "statement of purpose"
-                elif "lor" in check_phrase: check_phrase = "recommendation"
-                elif "gmat" in check_phrase: check_phrase = "gmat"
-                elif "gre" in check_phrase: check_phrase = "gre"
-                elif "shortlist" in check_phrase: check_phrase = "shortlist"
-                
-                for t in all_user_tasks:
-                    if check_phrase in t.title.lower():
-                        exists = True
-                        matched_task = t
-                        break
+        if matched_task is None:
+            new_task = models.Task(
+                user_id=user_id,
+                title=rule.title,
+                is_auto_generated=True,
+                status="Completed" if rule.stage_index < current_idx else "Pending"
+            )
+            db.add(new_task)
+            by_title[rule.title] = new_task
+            by_phrase.setdefault(rule.match_phrase, new_task)
+        elif rule.stage_index < current_idx and matched_task.status != "Completed":
+            # If stage is past, mark as completed
+            matched_task.status = "Completed"
 
-            if not exists:
-                # Create task
-                new_task = models.Task(
-                    user_id=user_id,
-                    title=title,
-                    is_auto_generated=True,
-                    status="Completed" if idx < current_idx else "Pending"
-                )
-                db.add(new_task)
-                # Append to local list so we don't duplicate within this loop execution if logic changes
-                all_user_tasks.append(new_task) 
-            else:
-                # If stage is past, mark as completed
-                if idx < current_idx and matched_task and matched_task.status != "Completed":
-                    matched_task.status = "Completed"
-    
     db.commit()
+    invalidate_student_snapshot(user_id)
+
+def ensure_stage_tasks(profile: models.Profile, db: Session) -> bool:
+    """
+    Runs the stage sync only if current_stage changed since the last sync (tracked by
+    Profile.stage_version). Call it after changing the stage; returns True when it synced.
+    """
+    if (profile.tasks_synced_version or 0) == (profile.stage_version or 1):
+        return False
+    profile.tasks_synced_version = profile.stage_version or 1
+    sync_stage_tasks(profile.user_id, profile.current_stage, db)
+    return True
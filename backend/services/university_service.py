@@ -1,60 +1,94 @@
-import requests
+import json
 import os
+from types import SimpleNamespace
+from sqlalchemy import JSON, Text, cast, event, func
+from sqlalchemy.orm import Session, object_session
+from models import models
 from .universities_data import MOCK_DATA
+from .search_index import UniversitySearchIndex, UNIVERSITY_DOC_COLUMNS, university_to_doc
+from .scorecard_client import ScorecardClient
+from .recommendation_engine import RecommendationCatalog
+from .compact_catalog import CompactCatalog, as_doc
+from .recommendation_cache import (
+    RECOMMENDATION_WARMUP_PROFILES, SCORING_FIELDS, profile_fingerprint,
+    get_cached_recommendations, set_cached_recommendations,
+)
 
 API_KEY = os.getenv("COLLEGE_SCORECARD_API_KEY")
-BASE_URL = "https://api.data.gov/ed/collegescorecard/v1/schools.json"
+SEARCH_RESULT_LIMIT = 50
+# Compact catalog file built by build_catalog.py; mapped by every worker instead of loading rows one by one
+CATALOG_PATH = os.getenv("CATALOG_PATH", "")
 
-def search_universities(query: str):
+scorecard_client = ScorecardClient(API_KEY) if API_KEY else None
+
+# Search index and recommendation columns over the catalog plus DB-backed universities, one per worker
+search_index = UniversitySearchIndex()
+recommendation_catalog = RecommendationCatalog()
+for _uni in MOCK_DATA:
+    search_index.add(_uni["id"], _uni)
+    recommendation_catalog.add(_uni["id"], _uni)
+
+def load_catalog(db: Session) -> int:
+    """
+    Fills the search index and recommendation catalog; called once at startup. Uses the compact
+    catalog file when CATALOG_PATH points at one, plus any University rows created after it was built.
+    """
+    added = 0
+    after_id = 0
+    if CATALOG_PATH and os.path.exists(CATALOG_PATH):
+        catalog = CompactCatalog(CATALOG_PATH)
+        rows = list(catalog)  # one set of row views shared by both structures
+        for row in rows:
+            search_index.add(row.key, row)
+        added += recommendation_catalog.add_compact(catalog, rows)
+        after_id = catalog.max_db_id
+    return added + load_db_universities(db, after_id)
+
+def load_db_universities(db: Session, after_id: int = 0) -> int:
+    """Adds University rows (with id > after_id) to the search index and recommendation catalog."""
+    added = 0
+    # Plain rows instead of ORM objects; the table can hold a full imported national dataset
+    columns = [getattr(models.University, c) for c in UNIVERSITY_DOC_COLUMNS]
+    for uni in db.query(*columns).filter(models.University.id > after_id).yield_per(1000):
+        doc = university_to_doc(uni)
+        if search_index.add(doc["id"], doc):
+            recommendation_catalog.add(doc["id"], doc)
+            added += 1
+    return added
+
+@event.listens_for(models.University, "after_insert")
+def _queue_new_university(mapper, connection, target):
+    # Only indexed once the transaction commits, so rolled back rows never show up
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("new_universities", []).append(university_to_doc(target))
+
+@event.listens_for(Session, "after_commit")
+def _index_new_universities(session):
+    for doc in session.info.pop("new_universities", []):
+        if search_index.add(doc["id"], doc):
+            recommendation_catalog.add(doc["id"], doc)
+
+@event.listens_for(Session, "after_rollback")
+def _drop_new_universities(session):
+    session.info.pop("new_universities", None)
+
+async def search_universities(query: str):
     results = []
     
-    # 1. Try Live API for USA
-    if API_KEY and query:
-        params = {
-            "api_key": API_KEY,
-            "school.search": query,
-            "fields": "id,school.name,school.city,school.state,latest.cost.tuition.out_of_state,latest.admissions.admission_rate.overall,school.school_url",
-            "per_page": 10,
-            "sort": "latest.admissions.admission_rate.overall:asc"
-        }
-        
-        try:
-            response = requests.get(BASE_URL, params=params, timeout=5)
-            if response.status_code == 200:
-                api_results = response.json().get("results", [])
-                for r in api_results:
-                    # Normalizing keys
-                    r["school.country"] = "USA"
-                    if r.get("latest.cost.tuition.out_of_state") is None:
-                        r["latest.cost.tuition.out_of_state"] = "N/A"
-                    if r.get("latest.admissions.admission_rate.overall") is None:
-                        r["latest.admissions.admission_rate.overall"] = 0.0
-                    
-                    # Fix URL if missing http
-                    website = r.get("school.school_url")
-                    if website and not website.startswith("http"):
-                        r["website"] = f"https://{website}"
-                    else:
-                        r["website"] = website
-                        
-                    results.append(r)
-        except Exception as e:
-            print(f"API Error: {e}")
+    # 1. Try Live API for USA (cached, coalesced, never blocks the event loop)
+    if scorecard_client and query:
+        # Copies, so callers can't mutate the cached results
+        results = [dict(r) for r in await scorecard_client.search(query)]
 
-    # 2. Search in Mock/Comprehensive Database (matches query)
+    # 2. Ranked, typo tolerant search over the catalog and DB universities
     if query:
-        query_lower = query.lower()
-        mock_matches = [
-            u for u in MOCK_DATA 
-            if query_lower in u["school.name"].lower() or 
-               query_lower in u.get("school.city", "").lower() or
-               query_lower in u.get("school.country", "").lower()
-        ]
-        # Append mock matches that aren't already in results (by name)
+        index_matches = search_index.search(query, limit=SEARCH_RESULT_LIMIT)
+        # Append index matches that aren't already in results (by name)
         existing_names = {r["school.name"] for r in results}
-        for m in mock_matches:
+        for m in index_matches:
             if m["school.name"] not in existing_names:
-                results.append(m)
+                results.append(as_doc(m))
     
     # 3. If no query, return some generic ones
     if not query:
@@ -62,38 +96,48 @@ def search_universities(query: str):
         
     return results
 
+def recommendation_profile(profile) -> dict:
+    """The Profile fields recommendations depend on, as a plain dict ({} without a profile)."""
+    if profile is None:
+        return {}
+    return {
+        "gpa": profile.gpa,
+        "exam_scores": profile.exam_scores or {},
+        "budget_range": profile.budget_range,
+        "preferred_countries": profile.preferred_countries or [],
+        "target_field": profile.target_field,
+    }
+
+def warm_recommendation_cache(db: Session) -> int:
+    """Precomputes recommendations for the most common profiles; called once at startup, after the catalog is loaded."""
+    # Counted in SQL: fingerprints are a function of the scoring columns, so only the top groups leave the
+    # database. JSON columns are grouped by their text (json has no equality operator on PostgreSQL).
+    json_fields = {field for field in SCORING_FIELDS if isinstance(getattr(models.Profile, field).type, JSON)}
+    columns = [cast(getattr(models.Profile, field), Text) if field in json_fields else getattr(models.Profile, field) for field in SCORING_FIELDS]
+    # Usually led by the empty profile of students who haven't finished onboarding
+    groups = db.query(*columns).group_by(*columns).order_by(func.count().desc()).limit(RECOMMENDATION_WARMUP_PROFILES)
+
+    warmed = set()
+    for row in groups:
+        fields = {field: json.loads(value) if field in json_fields and value is not None else value for field, value in zip(SCORING_FIELDS, row)}
+        profile = recommendation_profile(SimpleNamespace(**fields))
+        fingerprint = profile_fingerprint(profile)
+        # Groups that differ only in JSON formatting share a fingerprint
+        if fingerprint not in warmed:
+            warmed.add(fingerprint)
+            get_ai_recommendations(profile)
+    return len(warmed)
+
 def get_ai_recommendations(profile: dict):
     """
-    Returns universities grouped by Dream, Target, Safe based on a simple heuristic.
-    In a real app, this would use the profile's GPA/Test Scores.
+    Returns universities grouped by Dream, Target, Safe for the student's profile
+    (GPA, exam_scores, budget_range, preferred_countries). See RecommendationCatalog.
+    Memoized per profile fingerprint until the catalog changes.
     """
-    
-    # Heuristic based on admission rate (assuming a "good" student profile for now)
-    # Dream: < 15%
-    # Target: 15% - 40%
-    # Safe: > 40%
-    
-    recommendations = {
-        "Dream": [],
-        "Target": [],
-        "Safe": []
-    }
-    
-    # Mix from our comprehensive data
-    for uni in MOCK_DATA:
-        rate = uni.get("latest.admissions.admission_rate.overall", 0.5)
-        
-        if rate < 0.15:
-            recommendations["Dream"].append(uni)
-        elif 0.15 <= rate <= 0.45:
-            recommendations["Target"].append(uni)
-        else:
-            recommendations["Safe"].append(uni)
-            
-    # Limit results per category for the UI
-    recommendations["Dream"] = recommendations["Dream"][:4]
-    recommendations["Target"] = recommendations["Target"][:4]
-    recommendations["Safe"] = recommendations["Safe"][:4]
-    
+    fingerprint = profile_fingerprint(profile)
+    version = recommendation_catalog.version
+    recommendations = get_cached_recommendations(fingerprint, version)
+    if recommendations is None:
+        recommendations = recommendation_catalog.recommend(profile)
+        set_cached_recommendations(fingerprint, version, recommendations)
     return recommendations
-
@@ -0,0 +1,16 @@
+from utils.compression import MAGIC, TEXT_COMPRESSION_MIN_BYTES, compress_text, decompress_text, is_compressed
+
+def test_text_starting_with_the_header_round_trips():
+    for value in ["\x1fZz\x01hello", "\x1fZ", "\x1fZs\x00" + "x" * TEXT_COMPRESSION_MIN_BYTES, "\x1fZp\x00"]:
+        stored = compress_text(value)
+        assert is_compressed(stored)
+        assert decompress_text(stored) == value
+
+def test_short_and_long_text_round_trips():
+    short = "Thank you."
+    long = "USER: I want to pursue my Master's degree in Computer Science. " * 10
+    assert compress_text(short) == short.encode("utf-8")
+    assert compress_text(long).startswith(MAGIC)
+    assert decompress_text(compress_text(long)) == long
+    # Rows stored before compression come back from some drivers as str
+    assert decompress_text(short) == short
@@ -0,0 +1,87 @@
+"""
+Builds a compression dictionary (utils/compression.py) from the stored chat messages and interview transcripts.
+
+    python train_compression_dictionary.py 2 [max_bytes]
+
+Writes <TEXT_COMPRESSION_DICTIONARY_DIR>/2.dict and prints the size ratio with and without it. Set
+TEXT_COMPRESSION_DICTIONARY_ID=2 and restart the workers to compress new values with it. Keep the
+file (and older ones) for as long as rows written with them exist: each value records its dictionary id.
+Ids 0 (none) and 1 (built in) are reserved.
+"""
+from collections import Counter
+from models.database import SessionLocal
+from models.models import ChatMessage, Interview, InterviewTurn
+from utils import compression
+import os
+import random
+import sys
+
+SAMPLE_ROWS = 2000 # Per column, newest first
+PHRASE_WORDS = range(3, 9)
+
+def sample_texts(db) -> list:
+    texts = []
+    for column in (ChatMessage.text, Interview.transcript, InterviewTurn.text):
+        texts.extend(value for (value,) in db.query(column).filter(column.isnot(None)).order_by(column.class_.id.desc()).limit(SAMPLE_ROWS))
+    return texts
+
+def build_dictionary(texts: list, max_bytes: int) -> bytes:
+    """Raw-content dictionary of the phrases that recur across texts, most valuable last (zlib and zstd both favour the end)."""
+    counts = Counter()
+    for value in texts:
+        words = value.split()
+        # Counted once per text: a phrase repeated inside one text already compresses against itself
+        counts.update({" ".join(words[i:i + n]) for n in PHRASE_WORDS for i in range(len(words) - n + 1)})
+    picked, size = [], 0
+    for phrase, count in sorted(counts.items(), key=lambda item: item[1] * len(item[0]), reverse=True):
+        if count < 2 or size >= max_bytes:
+            break
+        if any(phrase in longer for longer in picked):
+            continue
+        picked.append(phrase)
+        size += len(phrase.encode("utf-8")) + 1
+    return "\n".join(reversed(picked)).encode("utf-8")[-max_bytes:]
+
+def stored_size(texts: list, dictionary: bytes) -> int:
+    total = 0
+    for value in texts:
+        data = value.encode("utf-8")
+        if len(data) < compression.TEXT_COMPRESSION_MIN_BYTES:
+            total += len(data)
+        else:
+            total += min(len(data), len(compression.MAGIC) + 2 + len(compression._compress(data, compression.CODEC_ZLIB, dictionary)))
+    return total
+
+def train(dictionary_id: int, max_bytes: int):
+    if dictionary_id < 2 or dictionary_id > 255:
+        sys.exit("Dictionary id must be between 2 and 255")
+    directory = compression.TEXT_COMPRESSION_DICTIONARY_DIR
+    if not directory:
+        sys.exit("Set TEXT_COMPRESSION_DICTIONARY_DIR first")
+    db = SessionLocal()
+    try:
+        texts = sample_texts(db)
+    finally:
+        db.close()
+    if not texts:
+        sys.exit("No stored texts to train on")
+
+    # Measured on texts the dictionary wasn't built from
+    random.Random(0).shuffle(texts)
+    held_out = texts[:max(1, len(texts) // 5)]
+    dictionary = build_dictionary(texts[len(held_out):] or texts, max_bytes)
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{dictionary_id}.dict")
+    with open(path, "wb") as f:
+        f.write(dictionary)
+
+    original = sum(len(value.encode("utf-8")) for value in held_out)
+    print(f"Wrote {len(dictionary)} byte dictionary to {path} from {len(texts)} texts")
+    for name, candidate in (("no dictionary", b""), ("built-in", compression.BUILTIN_DICTIONARY), (f"dictionary {dictionary_id}", dictionary)):
+        print(f"  {name}: size ratio {stored_size(held_out, candidate) / original:.3f}")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    train(int(sys.argv[1]), int(sys.argv[2]) if len(sys.argv) > 2 else 32 * 1024)
@@ -4,10 +4,13 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from models import models, database
+from utils.cache import LRUTTLCache
 from dotenv import load_dotenv
 import os
+import time
 
 load_dotenv()
 
@@ -28,6 +31,48 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 Days
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
 cookie_scheme = APIKeyCookie(name="access_token", auto_error=False)
 
+# Verified tokens -> Principal, so authenticated requests skip the JWT decode and the users lookup.
+# The cache is per worker and so is invalidate_user: after an account change (email, password,
+# deletion) other workers keep accepting cached tokens for up to PRINCIPAL_CACHE_TTL_SECONDS.
+# Keep the TTL short; it bounds that staleness.
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+
+class Principal:
+    """
+    The authenticated user as handlers see it: plain values, no ORM session attached.
+    """
+    __slots__ = ("id", "email")
+
+    def __init__(self, id: int, email: str):
+        self.id = id
+        self.email = email
+
+_principal_cache = LRUTTLCache(PRINCIPAL_CACHE_MAX_ENTRIES, ttl=PRINCIPAL_CACHE_TTL_SECONDS)
+# user id -> when the account last changed; cached entries from before that are ignored. Principals
+# expire after the same TTL, so older invalidations have nothing left to hide and are dropped.
+_user_invalidations = LRUTTLCache(PRINCIPAL_CACHE_MAX_ENTRIES, ttl=PRINCIPAL_CACHE_TTL_SECONDS)
+
+def invalidate_user(user_id: int):
+    """Drops every cached principal of the user in this worker. Call on account changes (email, password, deletion)."""
+    _user_invalidations.set(user_id, time.monotonic())
+
+def _get_cached_principal(token: str):
+    entry = _principal_cache.get(token)
+    if entry is None:
+        return None
+    principal, expires_at, cached_at = entry
+    invalidated_at = _user_invalidations.get(principal.id)
+    if expires_at <= time.time() or (invalidated_at is not None and cached_at <= invalidated_at):
+        _principal_cache.delete(token)
+        return None
+    return principal
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    invalidate_user(target.id)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -38,11 +83,28 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(
+def create_scoped_token(user_id: int, scope: str, expires_delta: timedelta, **claims) -> str:
+    """
+    Short-lived token good for one purpose only (e.g. one interview socket), for clients that can't
+    send the auth cookie. get_current_user rejects it.
+    """
+    return create_access_token({"sub": str(user_id), "scope": scope, **claims}, expires_delta)
+
+def decode_scoped_token(token: str, scope: str) -> Optional[dict]:
+    """The claims of a valid token for `scope`, or None."""
+    try:
+        payload = jwt.decode(token or "", SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("scope") != scope or payload.get("sub") is None:
+        return None
+    return payload
+
+async def get_current_user(
     token: Optional[str] = Depends(oauth2_scheme),
     cookie_token: Optional[str] = Depends(cookie_scheme),
-    db: Session = Depends(database.get_db)
-):
+    db: AsyncSession = Depends(database.get_async_db)
+) -> Principal:
     actual_token = cookie_token or token
     
     credentials_exception = HTTPException(
@@ -54,15 +116,28 @@ def get_current_user(
     if not actual_token:
         raise credentials_exception
 
+    # Tokens seen before were already verified; the session never opens a connection on a hit
+    principal = _get_cached_principal(actual_token)
+    if principal is not None:
+        return principal
+
     try:
         payload = jwt.decode(actual_token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
-        if user_id is None:
+        # Scoped tokens (create_scoped_token) are not session tokens
+        if user_id is None or payload.get("scope"):
             raise credentials_exception
-    except JWTError:
+        # asyncpg binds parameters strictly by type
+        user_id = int(user_id)
+    except (JWTError, ValueError):
         raise credentials_exception
         
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    # Taken before the lookup, so an invalidation that races with it still wins
+    looked_up_at = time.monotonic()
+    user = (await db.execute(select(models.User.id, models.User.email).where(models.User.id == user_id))).first()
     if user is None:
         raise credentials_exception
-    return user
+
+    principal = Principal(user.id, user.email)
+    _principal_cache.set(actual_token, (principal, payload.get("exp", 0), looked_up_at))
+    return principal
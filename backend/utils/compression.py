@@ -0,0 +1,135 @@
+import os
+import threading
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # optional, zlib is always available
+    zstandard = None
+
+# Stored format: MAGIC | codec (1 byte) | dictionary id (1 byte) | compressed bytes.
+# Anything without the magic is plain UTF-8, which is what short values (and rows written before
+# compression) look like. Plain text that itself starts with MAGIC (users can type anything) is
+# stored behind a CODEC_PLAIN header, so it is never taken for a compressed value.
+MAGIC = b"\x1fZ"
+CODEC_ZLIB, CODEC_ZSTD, CODEC_PLAIN = b"z", b"s", b"p"
+
+TEXT_COMPRESSION_CODEC = os.getenv("TEXT_COMPRESSION_CODEC", "zlib").lower()
+TEXT_COMPRESSION_LEVEL = int(os.getenv("TEXT_COMPRESSION_LEVEL", "6"))
+# Shorter values are stored as plain UTF-8: the header and the compressor's own overhead would eat the gain
+TEXT_COMPRESSION_MIN_BYTES = int(os.getenv("TEXT_COMPRESSION_MIN_BYTES", "128"))
+# Dictionaries from train_compression_dictionary.py live here as <id>.dict. Rows record the id they
+# were written with, so a dictionary file must be kept as long as rows use it.
+TEXT_COMPRESSION_DICTIONARY_DIR = os.getenv("TEXT_COMPRESSION_DICTIONARY_DIR", "")
+TEXT_COMPRESSION_DICTIONARY_ID = int(os.getenv("TEXT_COMPRESSION_DICTIONARY_ID", "1"))
+
+# Dictionary 1, built in: phrases that recur in interview transcripts and counsellor chats.
+# zlib matches against the end of a dictionary most cheaply, so the most common phrases come last.
+BUILTIN_DICTIONARY = (
+    "Statement of Purpose letters of recommendation application deadline scholarship tuition fee "
+    "cost of living acceptance rate ranking GPA GRE GMAT TOEFL IELTS SAT Masters Bachelors PhD "
+    "Computer Science Data Science Business Administration Engineering research assistantship "
+    "part-time job internship financial documents bank statement education loan sponsor "
+    "I would like to Could you please What are my chances Which universities should I apply to "
+    "Shortlisted to Target list Shortlisted to Dream list Shortlisted to Safe list Added task: "
+    "Locked - Welcome to the Application phase! Stage 4: Preparing Applications "
+    "Why did you choose this university? Why this program? What will you do after graduation? "
+    "Who is sponsoring your studies? What does your father do? How will you fund your education? "
+    "Do you have any relatives in the country? Do you plan to return to your home country? "
+    "Tell me about yourself. Tell me about your academic background. What are your career goals? "
+    "Thank you. That's a good answer. Can you elaborate on that? Can you be more specific? "
+    "Your visa is approved. Your visa has been rejected. I'm sorry, "
+    "the United States the USA the UK Canada Germany Australia university admissions officer visa officer "
+    "I am planning to study I want to pursue my Master's degree in because the university has "
+    "I have completed my Bachelor's degree in My father is sponsoring my education. "
+    "\nMODEL: \nUSER: MODEL: USER: "
+).encode("utf-8")
+
+_stats_lock = threading.Lock()
+_stats = {"compressed_values": 0, "plain_values": 0, "input_bytes": 0, "stored_bytes": 0, "decompressed_values": 0}
+
+def _count(**deltas):
+    with _stats_lock:
+        for key, delta in deltas.items():
+            _stats[key] += delta
+
+def compression_stats() -> dict:
+    """Per worker totals of values written through compress_text; ratio is stored / input bytes."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["ratio"] = round(stats["stored_bytes"] / stats["input_bytes"], 3) if stats["input_bytes"] else None
+    return stats
+
+_dictionaries = {0: b"", 1: BUILTIN_DICTIONARY}
+
+def get_dictionary(dictionary_id: int) -> bytes:
+    dictionary = _dictionaries.get(dictionary_id)
+    if dictionary is None:
+        path = os.path.join(TEXT_COMPRESSION_DICTIONARY_DIR, f"{dictionary_id}.dict")
+        if not TEXT_COMPRESSION_DICTIONARY_DIR or not os.path.exists(path):
+            raise ValueError(f"Compression dictionary {dictionary_id} not found in TEXT_COMPRESSION_DICTIONARY_DIR")
+        with open(path, "rb") as f:
+            dictionary = _dictionaries[dictionary_id] = f.read()
+    return dictionary
+
+def _write_codec() -> bytes:
+    if TEXT_COMPRESSION_CODEC == "zstd":
+        if zstandard is not None:
+            return CODEC_ZSTD
+        print("WARNING: TEXT_COMPRESSION_CODEC=zstd but zstandard is not installed, using zlib.")
+    return CODEC_ZLIB
+
+_codec = None
+
+def _zstd_dictionary(dictionary: bytes):
+    return zstandard.ZstdCompressionDict(dictionary, dict_type=zstandard.DICT_TYPE_AUTO) if dictionary else None
+
+def _compress(data: bytes, codec: bytes, dictionary: bytes) -> bytes:
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=TEXT_COMPRESSION_LEVEL, dict_data=_zstd_dictionary(dictionary)).compress(data)
+    # Raw deflate (negative window bits): no zlib header or checksum, the column doesn't need them
+    compressor = zlib.compressobj(TEXT_COMPRESSION_LEVEL, zlib.DEFLATED, -15, zdict=dictionary) if dictionary \
+        else zlib.compressobj(TEXT_COMPRESSION_LEVEL, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush()
+
+def _decompress(data: bytes, codec: bytes, dictionary: bytes) -> bytes:
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("Value was compressed with zstd but zstandard is not installed")
+        return zstandard.ZstdDecompressor(dict_data=_zstd_dictionary(dictionary)).decompress(data)
+    decompressor = zlib.decompressobj(-15, zdict=dictionary) if dictionary else zlib.decompressobj(-15)
+    return decompressor.decompress(data) + decompressor.flush()
+
+def compress_text(value: str) -> bytes:
+    """Encodes text for storage: compressed when that saves space, plain UTF-8 otherwise."""
+    global _codec
+    data = value.encode("utf-8")
+    if len(data) >= TEXT_COMPRESSION_MIN_BYTES:
+        if _codec is None:
+            _codec = _write_codec()
+        dictionary_id = TEXT_COMPRESSION_DICTIONARY_ID
+        stored = MAGIC + _codec + bytes([dictionary_id]) + _compress(data, _codec, get_dictionary(dictionary_id))
+        if len(stored) < len(data):
+            _count(compressed_values=1, input_bytes=len(data), stored_bytes=len(stored))
+            return stored
+    stored = MAGIC + CODEC_PLAIN + b"\x00" + data if is_compressed(data) else data
+    _count(plain_values=1, input_bytes=len(data), stored_bytes=len(stored))
+    return stored
+
+def is_compressed(data: bytes) -> bool:
+    """Whether stored bytes carry the header (compressed, or escaped plain text)."""
+    return data[:len(MAGIC)] == MAGIC
+
+def decompress_text(data) -> str:
+    """Inverse of compress_text. Also takes str, as drivers return for rows stored before compression."""
+    if isinstance(data, str):
+        return data
+    data = bytes(data)
+    if not is_compressed(data):
+        return data.decode("utf-8")
+    header = len(MAGIC)
+    codec, dictionary_id = data[header:header + 1], data[header + 1]
+    if codec == CODEC_PLAIN:
+        return data[header + 2:].decode("utf-8")
+    _count(decompressed_values=1)
+    return _decompress(data[header + 2:], codec, get_dictionary(dictionary_id)).decode("utf-8")
@@ -0,0 +1,94 @@
+from concurrent.futures import ProcessPoolExecutor
+from passlib.context import CryptContext
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+
+# Switching to pbkdf2_sha256 to avoid the common bcrypt 72-byte limit error in newer environments
+pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+
+# Hashing runs in its own processes so it neither holds the GIL nor eats the request threadpool
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_MAX_QUEUE = int(os.getenv("HASH_MAX_QUEUE", "64"))
+
+class HashQueueFull(Exception):
+    """Raised when more hash jobs are waiting than HASH_MAX_QUEUE allows."""
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def _verify(password: str, password_hash: str) -> bool:
+    return pwd_context.verify(password, password_hash)
+
+class PasswordHasher:
+    """
+    Async front for a process pool doing pbkdf2 work. Jobs beyond `max_queue`
+    are rejected instead of piling up, and queue depth/latency are tracked.
+    """
+
+    def __init__(self, workers: int = HASH_WORKERS, max_queue: int = HASH_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # spawn, not fork: forking a process that runs an event loop and threads isn't safe
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self.in_flight >= self.max_queue:
+            self.rejected += 1
+            raise HashQueueFull()
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        started = time.monotonic()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            latency = time.monotonic() - started
+            self.in_flight -= 1
+            self.completed += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await self._run(_verify, password, password_hash)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_depth": self.in_flight,
+            "max_queue_depth": self.max_in_flight,
+            "queue_limit": self.max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_latency_ms": round(self.total_latency / self.completed * 1000, 2) if self.completed else None,
+            "max_latency_ms": round(self.max_latency * 1000, 2),
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+password_hasher = PasswordHasher()
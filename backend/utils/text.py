@@ -0,0 +1,7 @@
+import re
+import unicodedata
+
+def normalize_text(text) -> str:
+    # Casefold and strip accents so "Zürich" matches "zurich"
+    text = unicodedata.normalize("NFKD", str(text or "")).encode("ascii", "ignore").decode("ascii")
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
@@ -229,14 +229,23 @@ function InterviewHistoryList({ mode }: { mode: string }) {
     const [transcript, setTranscript] = useState<any>(null);
 
     useEffect(() => {
-        fetch(`/api/interview/history?mode=${mode}`)
+        fetch(`/api/interview/history?mode=${mode}&limit=3`)
             .then(res => res.json())
             .then(data => {
-                if (Array.isArray(data)) setHistory(data.slice(0, 3));
+                if (Array.isArray(data.interviews)) setHistory(data.interviews);
             })
             .catch(console.error);
     }, [mode]);
 
+    // The list only carries previews; the transcript is fetched when one is opened
+    const openTranscript = (item: any) => {
+        setTranscript({ ...item, transcript: null });
+        fetch(`/api/interview/history/${item.id}`)
+            .then(res => res.json())
+            .then(data => setTranscript((current: any) => current && current.id === item.id ? data : current))
+            .catch(console.error);
+    };
+
     if (history.length === 0) return <div className="text-xs text-[#BFC9D1] font-bold italic">No sessions recorded yet.</div>;
 
     return (
@@ -245,7 +254,7 @@ function InterviewHistoryList({ mode }: { mode: string }) {
                 {history.map((h: any) => (
                     <div
                         key={h.id}
-                        onClick={() => setTranscript(h)}
+                        onClick={() => openTranscript(h)}
                         className="p-3 bg-[#EAEFEF]/30 rounded-xl hover:bg-[#EAEFEF] cursor-pointer transition-all flex items-center justify-between group"
                     >
                         <div>
@@ -283,7 +292,7 @@ function InterviewHistoryList({ mode }: { mode: string }) {
                             </button>
                         </div>
                         <div className="p-8 overflow-y-auto whitespace-pre-wrap font-medium text-[#25343F]/80 leading-relaxed bg-white scrollbar-hide">
-                            {transcript.full_transcript}
+                            {transcript.transcript ?? "Loading..."}
                         </div>
                     </div>
                 </div>
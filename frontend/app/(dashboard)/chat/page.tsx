@@ -14,6 +14,17 @@ function ChatContent() {
     const [loading, setLoading] = useState(false);
     const scrollRef = useRef<HTMLDivElement>(null);
 
+    // Cursor of the next older history page (null once the oldest message is loaded)
+    const [olderCursor, setOlderCursor] = useState<number | null>(null);
+    const [loadingOlder, setLoadingOlder] = useState(false);
+    const keepScrollRef = useRef<number | null>(null);
+
+    const toChatMessages = (page: any) => page.messages.map((m: any) => ({
+        role: m.role === "bot" ? "assistant" as const : "user" as const,
+        content: m.text || "",
+        isAction: !!m.is_action
+    }));
+
     // Initial History Fetch
     useEffect(() => {
         const fetchHistory = async () => {
@@ -23,12 +34,9 @@ function ChatContent() {
             try {
                 const res = await fetch(`/api/chat/history`);
                 const data = await res.json();
-                if (data.length > 0) {
-                    setMessages(data.map((m: any) => ({
-                        role: m.role === "bot" ? "assistant" : "user",
-                        content: m.text || "",
-                        isAction: !!m.is_action
-                    })));
+                setOlderCursor(data.next_cursor ?? null);
+                if (data.messages && data.messages.length > 0) {
+                    setMessages(toChatMessages(data));
                 } else {
                     setMessages([{
                         role: "assistant",
@@ -42,13 +50,34 @@ function ChatContent() {
         fetchHistory();
     }, [mode]);
 
-    // Scroll to bottom
+    // Scroll to bottom, or keep the viewport in place when older messages were prepended
     useEffect(() => {
         if (scrollRef.current) {
-            scrollRef.current.scrollTop = scrollRef.current.scrollHeight;
+            const previousHeight = keepScrollRef.current;
+            keepScrollRef.current = null;
+            scrollRef.current.scrollTop = previousHeight !== null
+                ? scrollRef.current.scrollHeight - previousHeight
+                : scrollRef.current.scrollHeight;
         }
     }, [messages, loading]);
 
+    const loadOlder = async () => {
+        if (olderCursor === null || loadingOlder) return;
+        setLoadingOlder(true);
+        try {
+            const res = await fetch(`/api/chat/history?before=${olderCursor}`);
+            if (!res.ok) throw new Error("Network error");
+            const data = await res.json();
+            keepScrollRef.current = scrollRef.current ? scrollRef.current.scrollHeight - scrollRef.current.scrollTop : null;
+            setMessages(prev => [...toChatMessages(data), ...prev]);
+            setOlderCursor(data.next_cursor ?? null);
+        } catch (e) {
+            console.error("Failed to fetch older messages:", e);
+        } finally {
+            setLoadingOlder(false);
+        }
+    };
+
     const handleSend = async (overrideInput?: string) => {
         const msgToSend = overrideInput || input;
         if (!msgToSend.trim()) return;
@@ -58,23 +87,70 @@ function ChatContent() {
         setLoading(true);
 
         try {
-            const res = await fetch("/api/chat", {
+            const res = await fetch("/api/chat/stream", {
                 method: "POST",
                 headers: {
                     "Content-Type": "application/json",
                 },
                 body: JSON.stringify({
-                    message: input
+                    message: msgToSend
                 }),
-            }); if (!res.ok) throw new Error("Network error");
+            });
+            if (!res.ok || !res.body) throw new Error("Network error");
 
-            const data = await res.json();
-            setMessages(prev => [...prev, { role: "assistant", content: data.response }]);
+            // Server-Sent Events: render tokens as they arrive, actions come with the final "done" event
+            const reader = res.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = "";
+            let started = false;
 
-            if (data.actions_taken && data.actions_taken.length > 0) {
-                data.actions_taken.forEach((action: string) => {
-                    setMessages(prev => [...prev, { role: "assistant", content: action, isAction: true }]);
+            const appendToken = (text: string) => {
+                if (!started) {
+                    started = true;
+                    setLoading(false);
+                    setMessages(prev => [...prev, { role: "assistant", content: text }]);
+                    return;
+                }
+                setMessages(prev => {
+                    const next = [...prev];
+                    const last = next[next.length - 1];
+                    next[next.length - 1] = { ...last, content: last.content + text };
+                    return next;
                 });
+            };
+
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+
+                const events = buffer.split("\n\n");
+                buffer = events.pop() || "";
+                for (const raw of events) {
+                    const event = raw.match(/^event: (.*)$/m)?.[1];
+                    const payload = raw.match(/^data: (.*)$/m)?.[1];
+                    if (!event || !payload) continue;
+                    const data = JSON.parse(payload);
+
+                    if (event === "token") {
+                        appendToken(data.text);
+                    } else if (event === "done") {
+                        if (!started) appendToken("");
+                        // Replace the streamed text with the final cleaned reply
+                        setMessages(prev => {
+                            const next = [...prev];
+                            next[next.length - 1] = { role: "assistant", content: data.response };
+                            return next;
+                        });
+                        if (data.actions_taken && data.actions_taken.length > 0) {
+                            data.actions_taken.forEach((action: string) => {
+                                setMessages(prev => [...prev, { role: "assistant", content: action, isAction: true }]);
+                            });
+                        }
+                    } else if (event === "error") {
+                        throw new Error(data.detail);
+                    }
+                }
             }
         } catch (e) {
             setMessages(prev => [...prev, { role: "assistant", content: "Sorry, I encountered a network error. Let's try again." }]);
@@ -125,6 +201,17 @@ function ChatContent() {
 
             {/* Messages Area */}
             <div className="flex-1 overflow-y-auto p-4 md:p-8 space-y-6 scrollbar-hide" ref={scrollRef}>
+                {olderCursor !== null && (
+                    <div className="flex justify-center">
+                        <button
+                            onClick={loadOlder}
+                            disabled={loadingOlder}
+                            className="px-4 py-2 bg-[#EAEFEF]/50 text-[#25343F] rounded-full font-black text-[9px] md:text-[10px] uppercase tracking-widest border border-[#BFC9D1]/20 hover:bg-[#EAEFEF] transition-all disabled:opacity-50"
+                        >
+                            {loadingOlder ? "Loading..." : "Load earlier messages"}
+                        </button>
+                    </div>
+                )}
                 {messages.map((msg, i) => (
                     <div key={i} className={`flex ${msg.role === "user" ? "justify-end" : "justify-start"} animate-in fade-in slide-in-from-bottom-2 duration-300`}>
                         <div className={`flex gap-3 md:gap-4 max-w-[90%] md:max-w-[85%] ${msg.role === "user" ? "flex-row-reverse" : "flex-row"}`}>
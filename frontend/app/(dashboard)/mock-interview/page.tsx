@@ -24,19 +24,24 @@ function MockInterviewContent() {
         startListening,
         stopListening,
         speak,
+        enqueueSpeech,
+        whenSpeechDone,
         cancelSpeech,
         error: speechError
     } = useInterviewParams();
 
     const [mode, setMode] = useState<Mode>('selection');
     const [history, setHistory] = useState<Message[]>([]);
+    // Server-side session: turns are stored there, so each request only carries the new answer
+    const [sessionId, setSessionId] = useState<number | null>(null);
+    // Voice channel of the session: replies stream back sentence by sentence; HTTP turns are the fallback
+    const socketRef = useRef<WebSocket | null>(null);
+    const phaseRef = useRef<string>('in_progress');
     const [processing, setProcessing] = useState(false);
     const [elapsedSeconds, setElapsedSeconds] = useState(0);
     const interviewLimit = 300; // 5 minutes in seconds
 
     // Context Data
-    const [lockedUni, setLockedUni] = useState<string | null>(null);
-    const [targetCountry, setTargetCountry] = useState<string>("USA");
     const [canTakeUni, setCanTakeUni] = useState(false);
     const [loading, setLoading] = useState(true);
 
@@ -45,8 +50,6 @@ function MockInterviewContent() {
         fetch('/api/interview/status')
             .then(res => res.json())
             .then(data => {
-                setLockedUni(data.locked_university);
-                setTargetCountry(data.target_country);
                 setCanTakeUni(data.can_take_university_interview);
                 setLoading(false);
 
@@ -97,22 +100,32 @@ function MockInterviewContent() {
     const handleSend = async (text: string) => {
         setProcessing(true);
 
-        const newHistory = [...history, { role: 'user', text } as Message];
-        setHistory(newHistory);
+        setHistory(prev => [...prev, { role: 'user', text }]);
+
+        const socket = socketRef.current;
+        if (socket && socket.readyState === WebSocket.OPEN) {
+            // The reply is spoken as its sentences arrive; processing ends with the "done" message
+            socket.send(JSON.stringify({
+                type: 'answer',
+                text,
+                elapsed_seconds: mode === 'visa' ? elapsedSeconds : null
+            }));
+            return;
+        }
 
         try {
-            const timeContext = mode === 'visa' ? ` [Time: ${Math.floor(elapsedSeconds / 60)} mins ${elapsedSeconds % 60} secs]` : '';
-            const res = await fetch('/api/interview/chat', {
+            if (sessionId === null) throw new Error("No interview session");
+            const res = await fetch(`/api/interview/sessions/${sessionId}/turns`, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                 },
                 body: JSON.stringify({
-                    message: text + timeContext,
-                    mode: mode,
-                    history: newHistory.slice(-10)
+                    message: text,
+                    elapsed_seconds: mode === 'visa' ? elapsedSeconds : null
                 })
             });
+            if (!res.ok) throw new Error("Network error");
 
             const data = await res.json();
             const aiResponse = data.response;
@@ -132,17 +145,65 @@ function MockInterviewContent() {
         }
     };
 
-    const startSession = (selectedMode: Mode) => {
+    const openSocket = (id: number, token: string) => {
+        const apiBase = process.env.NEXT_PUBLIC_API_URL || "http://127.0.0.1:8000";
+        const socket = new WebSocket(`${apiBase.replace(/^http/, 'ws')}/api/interview/sessions/${id}/ws?token=${encodeURIComponent(token)}`);
+        phaseRef.current = 'in_progress';
+
+        socket.onmessage = (event) => {
+            const data = JSON.parse(event.data);
+            if (data.type === 'sentence') {
+                setHistory(prev => data.index === 0
+                    ? [...prev, { role: 'model', text: data.text }]
+                    : [...prev.slice(0, -1), { role: 'model', text: `${prev[prev.length - 1].text} ${data.text}` }]);
+                enqueueSpeech(data.text);
+            } else if (data.type === 'time') {
+                phaseRef.current = data.phase;
+            } else if (data.type === 'done') {
+                setProcessing(false);
+                // After the visa verdict there is nothing left to answer
+                whenSpeechDone(() => {
+                    if (phaseRef.current !== 'verdict') startListening();
+                });
+            } else if (data.type === 'error') {
+                console.error("Interview socket error", data.detail);
+                setProcessing(false);
+            }
+        };
+        socket.onclose = () => {
+            if (socketRef.current === socket) socketRef.current = null;
+            setProcessing(false);
+        };
+        socketRef.current = socket;
+    };
+
+    // Close the socket when leaving the page
+    useEffect(() => () => socketRef.current?.close(), []);
+
+    const startSession = async (selectedMode: Mode) => {
         setMode(selectedMode);
         setHistory([]);
+        setSessionId(null);
 
         let greeting = "";
-        if (selectedMode === 'university') {
-            const uniName = lockedUni || "your target university";
-            greeting = `Hello, thank you for joining me. I am the admissions officer for ${uniName}. Shall we begin?`;
-        } else {
-            const country = targetCountry || "USA";
-            greeting = `Good morning. Please step forward. I am the Visa Officer for ${country}. Can I see your passport?`;
+        try {
+            // The server resolves the persona once and stores the greeting as the first turn
+            const res = await fetch('/api/interview/sessions', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({ mode: selectedMode })
+            });
+            if (!res.ok) throw new Error("Network error");
+            const data = await res.json();
+            setSessionId(data.session_id);
+            greeting = data.greeting;
+            openSocket(data.session_id, data.socket_token);
+        } catch (e) {
+            console.error("Failed to start interview session", e);
+            setMode('selection');
+            return;
         }
 
         setHistory([{ role: 'model', text: greeting }]);
@@ -159,15 +220,13 @@ function MockInterviewContent() {
         cancelSpeech();
         stopListening();
 
-        const fullTranscript = history.map(m => `${m.role.toUpperCase()}: ${m.text}`).join('\n');
-        if (fullTranscript) {
-            await fetch('/api/interview/save', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({ transcript: fullTranscript, mode: mode })
-            });
+        socketRef.current?.close();
+        socketRef.current = null;
+
+        // The transcript is assembled on the server from the stored turns
+        if (sessionId !== null) {
+            await fetch(`/api/interview/sessions/${sessionId}/end`, { method: 'POST' });
+            setSessionId(null);
         }
 
         const targetPath = mode === 'visa' ? '/visa' : '/applications';
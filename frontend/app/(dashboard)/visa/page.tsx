@@ -13,6 +13,38 @@ export default function VisaPage() {
     const [statusLoading, setStatusLoading] = useState(true);
     const [statusData, setStatusData] = useState<any>(null);
     const [selectedTranscript, setSelectedTranscript] = useState<any>(null);
+    const [nextCursor, setNextCursor] = useState<number | null>(null);
+    const [loadingMore, setLoadingMore] = useState(false);
+
+    const fetchHistoryPage = async (before: number | null) => {
+        const res = await fetch(`/api/interview/history?mode=visa${before !== null ? `&before=${before}` : ""}`);
+        if (!res.ok) throw new Error("Network error");
+        const data = await res.json();
+        setNextCursor(data.next_cursor ?? null);
+        return data.interviews;
+    };
+
+    const loadMore = async () => {
+        if (nextCursor === null || loadingMore) return;
+        setLoadingMore(true);
+        try {
+            const older = await fetchHistoryPage(nextCursor);
+            setHistory(prev => [...prev, ...older]);
+        } catch (err) {
+            console.error(err);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
+    // The list only carries previews; the transcript is fetched when one is opened
+    const openTranscript = (item: any) => {
+        setSelectedTranscript({ ...item, transcript: null });
+        fetch(`/api/interview/history/${item.id}`)
+            .then(res => res.json())
+            .then(data => setSelectedTranscript((current: any) => current && current.id === item.id ? data : current))
+            .catch(err => console.error(err));
+    };
 
     useEffect(() => {
         // Fetch Interview Status
@@ -23,9 +55,8 @@ export default function VisaPage() {
             .finally(() => setStatusLoading(false));
 
         // Fetch Visa History
-        fetch('/api/interview/history?mode=visa')
-            .then(res => res.json())
-            .then(data => setHistory(data))
+        fetchHistoryPage(null)
+            .then(interviews => setHistory(interviews))
             .catch(err => console.error(err))
             .finally(() => setLoading(false));
     }, []);
@@ -86,7 +117,7 @@ export default function VisaPage() {
                         {history.map((item) => (
                             <div
                                 key={item.id}
-                                onClick={() => setSelectedTranscript(item)}
+                                onClick={() => openTranscript(item)}
                                 className="bg-white p-6 rounded-2xl border border-zinc-100 shadow-sm hover:shadow-md transition-all cursor-pointer group flex items-center justify-between"
                             >
                                 <div>
@@ -100,6 +131,15 @@ export default function VisaPage() {
                                 </div>
                             </div>
                         ))}
+                        {nextCursor !== null && (
+                            <button
+                                onClick={loadMore}
+                                disabled={loadingMore}
+                                className="w-full p-4 rounded-2xl border-2 border-dashed border-zinc-200 text-zinc-400 font-bold hover:border-[#BFC9D1] hover:text-[#25343F] transition-all disabled:opacity-50"
+                            >
+                                {loadingMore ? "Loading..." : "Show older interviews"}
+                            </button>
+                        )}
                     </div>
                 )}
             </div>
@@ -136,7 +176,7 @@ export default function VisaPage() {
                                 </button>
                             </div>
                             <div className="p-8 overflow-y-auto whitespace-pre-wrap font-medium text-[#25343F]/80 leading-relaxed bg-white scrollbar-hide">
-                                {selectedTranscript.full_transcript}
+                                {selectedTranscript.transcript ?? <Loader2 className="animate-spin text-zinc-300 w-6 h-6 mx-auto" />}
                             </div>
                         </motion.div>
                     </motion.div>
@@ -109,19 +109,30 @@ export function useInterviewParams() {
         }
     }, []);
 
+    // Sentences queued by enqueueSpeech that haven't finished, and what to run once they all have
+    const pendingUtterancesRef = useRef(0);
+    const queueDrainedRef = useRef<(() => void) | null>(null);
+
+    const createUtterance = (synth: SpeechSynthesis, text: string) => {
+        const utterance = new SpeechSynthesisUtterance(text);
+        utterance.rate = 1.0;
+        utterance.pitch = 1.0;
+
+        // Try to find a good voice (not essential but nice)
+        const voices = synth.getVoices();
+        const preferred = voices.find(v => v.name.includes('Google US English')) || voices.find(v => v.lang === 'en-US');
+        if (preferred) utterance.voice = preferred;
+        return utterance;
+    };
+
     const speak = useCallback((text: string, onEnd?: () => void) => {
         if (synthRef.current) {
             // Cancel previous
             synthRef.current.cancel();
+            pendingUtterancesRef.current = 0;
+            queueDrainedRef.current = null;
 
-            const utterance = new SpeechSynthesisUtterance(text);
-            utterance.rate = 1.0;
-            utterance.pitch = 1.0;
-
-            // Try to find a good voice (not essential but nice)
-            const voices = synthRef.current.getVoices();
-            const preferred = voices.find(v => v.name.includes('Google US English')) || voices.find(v => v.lang === 'en-US');
-            if (preferred) utterance.voice = preferred;
+            const utterance = createUtterance(synthRef.current, text);
 
             utterance.onstart = () => setIsSpeaking(true);
             utterance.onend = () => {
@@ -139,8 +150,47 @@ export function useInterviewParams() {
         }
     }, []);
 
+    // Queues a sentence behind the ones already speaking, so a streamed reply is spoken as it arrives
+    const enqueueSpeech = useCallback((text: string) => {
+        if (!synthRef.current) return;
+        const utterance = createUtterance(synthRef.current, text);
+        pendingUtterancesRef.current += 1;
+
+        const finished = () => {
+            // Utterances dropped by cancelSpeech were already taken off the count
+            if (pendingUtterancesRef.current === 0) return;
+            pendingUtterancesRef.current -= 1;
+            if (pendingUtterancesRef.current === 0) {
+                setIsSpeaking(false);
+                const onDrained = queueDrainedRef.current;
+                queueDrainedRef.current = null;
+                if (onDrained) onDrained();
+            }
+        };
+        utterance.onstart = () => setIsSpeaking(true);
+        utterance.onend = finished;
+        utterance.onerror = (e) => {
+            if (e.error !== 'interrupted') {
+                console.error("Speech synthesis error", e);
+            }
+            finished();
+        };
+        synthRef.current.speak(utterance);
+    }, []);
+
+    // Runs `callback` once every queued sentence has been spoken (right away if none is pending)
+    const whenSpeechDone = useCallback((callback: () => void) => {
+        if (pendingUtterancesRef.current === 0) {
+            callback();
+        } else {
+            queueDrainedRef.current = callback;
+        }
+    }, []);
+
     const cancelSpeech = useCallback(() => {
         if (synthRef.current) {
+            pendingUtterancesRef.current = 0;
+            queueDrainedRef.current = null;
             synthRef.current.cancel();
             setIsSpeaking(false);
         }
@@ -154,6 +204,8 @@ export function useInterviewParams() {
         startListening,
         stopListening,
         speak,
+        enqueueSpeech,
+        whenSpeechDone,
         cancelSpeech,
         error
     };